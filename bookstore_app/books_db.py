@@ -0,0 +1,222 @@
+import re
+import sqlite3
+import threading
+
+BULK_ROWS = 1000  #insert_many batches of at least this many records are indexed in one statement
+MIN_PREFIX = 2  #Shortest last word of match() searched as a prefix (shorter ones are not in the prefix index)
+INSERT_TRIGGER = ("CREATE TRIGGER book_search_insert AFTER INSERT ON book_records BEGIN "
+                  "INSERT INTO book_search(rowid, title, author, isbn) VALUES (new.rowid, new.title, new.author, new.isbn); END")
+
+class Books_db():
+    """
+    This class stores book records with title, author, year and ISBN in an SQLite
+    database. Each thread using the database gets its own long lived connection,
+    opened on first use and kept until close(). The database runs in WAL mode so
+    readers do not block the writer. A unique index on all four fields rejects
+    duplicate records, and indexes on author, year and ISBN (title is covered by
+    the unique index) keep searches and duplicate checks from scanning the table.
+    Title, author and ISBN are also indexed in an FTS5 full-text index, kept in sync
+    with the records by triggers, for ranked word and prefix matching with match().
+    Large batches of insert_many() skip the insert trigger and index the new records
+    in one statement instead, which loads about three times faster.
+    """
+    #Create/Connect to database file
+    def __init__(self, db):
+        self.__db_file = db  #Database
+        self.__local = threading.local()  #Connection of each thread
+        self.__connections = []  #All open connections
+        self.__lock = threading.Lock()
+        self.__fts = True  #SQLite has FTS5, else match() falls back to LIKE
+        self.create_table()
+
+    def __del__(self):
+        self.close()
+
+    #Return database file name
+    def get_db(self):
+        return self.__db_file
+
+    #Connection of the calling thread, opened on first use
+    def connection(self):
+        conn = getattr(self.__local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.__db_file, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")  #Safe with WAL, syncs on checkpoint only
+            self.__local.conn = conn
+            with self.__lock:
+                self.__connections.append(conn)
+        return conn
+
+    #Close all connections
+    def close(self):
+        with self.__lock:
+            for conn in self.__connections:
+                conn.close()
+            self.__connections = []
+        self.__local = threading.local()
+
+    #Create table and indexes. Duplicate records left by older versions are removed first.
+    def create_table(self):
+        conn = self.connection()
+        with conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS book_records (title TEXT, author TEXT, year INTEGER, isbn TEXT)")
+            if not conn.execute("SELECT 1 FROM sqlite_master WHERE name='book_records_unique'").fetchone():
+                conn.execute("DELETE FROM book_records WHERE rowid NOT IN "
+                             "(SELECT MIN(rowid) FROM book_records GROUP BY title, author, year, isbn)")
+                conn.execute("CREATE UNIQUE INDEX book_records_unique ON book_records (title, author, year, isbn)")
+            conn.execute("CREATE INDEX IF NOT EXISTS book_records_author ON book_records (author)")
+            conn.execute("CREATE INDEX IF NOT EXISTS book_records_year ON book_records (year)")
+            conn.execute("CREATE INDEX IF NOT EXISTS book_records_isbn ON book_records (isbn)")
+        self.create_search_index()
+
+    #Create full-text index of title, author and ISBN. It stores no copy of the text,
+    #only the index, and is built from existing records when first created.
+    def create_search_index(self):
+        conn = self.connection()
+        try:
+            with conn:
+                if conn.execute("SELECT 1 FROM sqlite_master WHERE name='book_search'").fetchone():
+                    return
+                conn.execute("CREATE VIRTUAL TABLE book_search USING fts5(title, author, isbn, "
+                             "content='book_records', content_rowid='rowid', prefix='2 3')")
+                conn.execute(INSERT_TRIGGER)
+                conn.execute("CREATE TRIGGER book_search_delete AFTER DELETE ON book_records BEGIN "
+                             "INSERT INTO book_search(book_search, rowid, title, author, isbn) VALUES ('delete', old.rowid, old.title, old.author, old.isbn); END")
+                conn.execute("CREATE TRIGGER book_search_update AFTER UPDATE ON book_records BEGIN "
+                             "INSERT INTO book_search(book_search, rowid, title, author, isbn) VALUES ('delete', old.rowid, old.title, old.author, old.isbn); "
+                             "INSERT INTO book_search(rowid, title, author, isbn) VALUES (new.rowid, new.title, new.author, new.isbn); END")
+                conn.execute("INSERT INTO book_search(book_search) VALUES ('rebuild')")
+        except sqlite3.OperationalError:  #No FTS5 in this SQLite build
+            self.__fts = False
+
+    #Insert record into database. Returns False if the record already exists.
+    def insert(self, title, author, year, isbn):
+        conn = self.connection()
+        with conn:
+            cur = conn.execute("INSERT OR IGNORE INTO book_records VALUES(?,?,?,?)", (title, author, int(year), isbn))
+        return cur.rowcount == 1
+
+    #Remove record from database. Returns number of records removed.
+    def delete(self, title, author, year, isbn):
+        conn = self.connection()
+        with conn:
+            cur = conn.execute("DELETE FROM book_records WHERE title=? AND author=? AND year=? AND isbn=?", (title, author, year, isbn))
+        return cur.rowcount
+
+    #Update record from database. Returns False if the updated record already exists.
+    def update(self, title, author, year, isbn, current_title, current_author, current_year, current_isbn):
+        conn = self.connection()
+        try:
+            with conn:
+                conn.execute("UPDATE book_records SET title=?, author=?, year=?, isbn=? WHERE title=? AND author=? AND year=? AND isbn=?", (title, author, year, isbn, current_title, current_author, current_year, current_isbn))
+        except sqlite3.IntegrityError:
+            return False
+        return True
+
+    #Insert many records in one transaction. Duplicates are skipped. Returns number of records inserted.
+    #For BULK_ROWS records or more, the insert trigger is dropped for the transaction and
+    #the new records (rowids above the largest before) are added to the full-text index
+    #by one INSERT ... SELECT, instead of one index update per record.
+    def insert_many(self, records):
+        records = list(records)
+        conn = self.connection()
+        with conn:
+            if not self.__fts or len(records) < BULK_ROWS:
+                cur = conn.executemany("INSERT OR IGNORE INTO book_records VALUES(?,?,?,?)", records)
+                return cur.rowcount
+            conn.execute("BEGIN IMMEDIATE")  #DDL does not open a transaction by itself
+            last = conn.execute("SELECT coalesce(max(rowid), 0) FROM book_records").fetchone()[0]
+            conn.execute("DROP TRIGGER book_search_insert")
+            cur = conn.executemany("INSERT OR IGNORE INTO book_records VALUES(?,?,?,?)", records)
+            conn.execute("INSERT INTO book_search(rowid, title, author, isbn) "
+                         "SELECT rowid, title, author, isbn FROM book_records WHERE rowid > ?", (last,))
+            conn.execute(INSERT_TRIGGER)
+        return cur.rowcount
+
+    #Retrieve all records from database
+    def view(self):
+        return self.connection().execute("SELECT * FROM book_records").fetchall()
+
+    #Retrieve all records from database in chunks of chunk_size records
+    def iter_records(self, chunk_size=10000):
+        cur = self.connection().execute("SELECT * FROM book_records")
+        while True:
+            rows = cur.fetchmany(chunk_size)
+            if not rows:
+                break
+            yield rows
+
+    #Check if record exists in database
+    def exists(self, title, author, year, isbn):
+        cur = self.connection().execute("SELECT 1 FROM book_records WHERE title=? AND author=? AND year=? AND isbn=?", (title, author, year, isbn))
+        return cur.fetchone() is not None
+
+    #Retrieve up to limit records matching the non-empty fields, ordered by title, author,
+    #year and ISBN, that come after record `after` (keyset pagination on the unique index)
+    def page(self, title, author, year, isbn, after=None, limit=100):
+        col = ["title", "author", "year", "isbn"]
+        conditions = [c + "=?" for c, value in zip(col, [title, author, year, isbn]) if value != ""]
+        command_p = [value for value in [title, author, year, isbn] if value != ""]
+        if after is not None:
+            conditions.append("(title, author, year, isbn) > (?,?,?,?)")
+            command_p.extend(after)
+        command = "SELECT * FROM book_records"
+        if conditions:
+            command = command + " WHERE " + " AND ".join(conditions)
+        command = command + " ORDER BY title, author, year, isbn LIMIT ?"
+        return self.connection().execute(command, command_p + [limit]).fetchall()
+
+    #Retrieve up to limit records, best match first, whose title, author or ISBN contain
+    #every word of text, the last word of MIN_PREFIX or more characters also matching as
+    #a prefix ("harry pot" finds "Harry Potter"). Matches in the title rank above author
+    #and ISBN matches. Only the first rank_limit matches (or offset + limit, for later
+    #pages) in the order they were added are scored, which keeps a page of a common word
+    #to a few milliseconds; the best of those are returned. Records can be filtered by
+    #year, and offset skips the records of earlier pages.
+    def match(self, text, year="", limit=100, offset=0, rank_limit=2000):
+        words = re.findall(r"\w+", text)
+        if not words:
+            return self.page("", "", year, "", None, limit)
+        command_p = []
+        if self.__fts:
+            query = " ".join('"%s"' % word for word in words) + ("*" if len(words[-1]) >= MIN_PREFIX else "")
+            source = "book_search"
+            if year != "":  #CROSS JOIN keeps the full-text index as the outer loop
+                source = "book_search CROSS JOIN book_records r ON r.rowid = book_search.rowid AND r.year=?"
+                command_p.append(year)
+            command_p.append(query)
+            command = ("SELECT b.* FROM (SELECT rowid, score FROM (SELECT book_search.rowid AS rowid, "
+                       "bm25(book_search, 10.0, 5.0, 1.0) AS score FROM " + source + " WHERE book_search MATCH ? LIMIT ?) "
+                       "ORDER BY score, rowid LIMIT ? OFFSET ?) s JOIN book_records b ON b.rowid = s.rowid ORDER BY s.score, s.rowid")
+            return self.connection().execute(command, command_p + [max(rank_limit, offset + limit), limit, offset]).fetchall()
+        else:
+            command = "SELECT * FROM book_records b WHERE " + " AND ".join(["(title LIKE ? OR author LIKE ? OR isbn LIKE ?)"] * len(words))
+            for word in words:
+                command_p.extend(["%" + word + "%"] * 3)
+            order = "b.title, b.author, b.year, b.isbn"
+        if year != "":
+            command = command + " AND b.year=?"
+            command_p.append(year)
+        command = command + " ORDER BY " + order + " LIMIT ? OFFSET ?"
+        return self.connection().execute(command, command_p + [limit, offset]).fetchall()
+
+    #Search record from database
+    def search(self, title, author, year, isbn):
+        command = "SELECT * FROM book_records"
+        col = ["title", "author", "year", "isbn"]
+        parameter = [title, author, year, isbn]
+        command_p = []
+        first_para = True
+
+        if not all (field=="" for field in parameter):   #SAME AS if not all([title=="", author=="", year=="", isbn==""]):
+            command = command + " WHERE"
+            for idx, value in enumerate (parameter):
+                if value!="":
+                    if first_para == False:
+                        command = command + " AND"
+                    command = command + " " + col[idx] + "=?"
+                    command_p.append(value)
+                    first_para = False
+
+        return self.connection().execute(command,command_p).fetchall()
@@ -18,7 +18,8 @@
 
 
 from tkinter import *
-import sqlite3
+from books_db import Books_db
+from record_list import Record_List
 
 
 # In[2]:
@@ -30,83 +31,49 @@ db_file = "mybooks.db"
 # In[3]:
 
 
+#Connect to database file. One connection is kept open for the whole session.
+books = Books_db(db_file)
+
 #Create/Connect to database file
 def create_table():
-    conn=sqlite3.connect(db_file)
-    cur=conn.cursor()
-    cur.execute("CREATE TABLE IF NOT EXISTS book_records (title TEXT, author TEXT, year INTEGER, isbn TEXT)")
-    conn.commit()
-    conn.close()
+    books.create_table()
 
-#Insert record into database
+#Insert record into database. Returns False if the record already exists.
 def insert(title, author, year, isbn):
-    conn=sqlite3.connect(db_file)
-    cur=conn.cursor()
-    cur.execute("INSERT INTO book_records VALUES(?,?,?,?)",(title, author, int(year), isbn))
-    conn.commit()
-    conn.close()
+    return books.insert(title, author, year, isbn)
 
 #Remove record from database
 def delete(title, author, year, isbn):
-    conn=sqlite3.connect(db_file)
-    cur=conn.cursor()
-    cur.execute("DELETE FROM book_records WHERE title=? AND author=? AND year=? AND isbn=?",(title, author, year, isbn))
-    conn.commit()
-    conn.close()
+    return books.delete(title, author, year, isbn)
 
-#Update record from database
+#Update record from database. Returns False if the updated record already exists.
 def update(title, author, year, isbn, current_title, current_author, current_year, current_isbn):
-    conn=sqlite3.connect(db_file)
-    cur=conn.cursor()
-    cur.execute("UPDATE book_records SET title=?, author=?, year=?, isbn=? WHERE title=? AND author=? AND year=? AND isbn=?",(title, author, year, isbn, current_title, current_author, current_year, current_isbn))
-    conn.commit()
-    conn.close()
+    return books.update(title, author, year, isbn, current_title, current_author, current_year, current_isbn)
 
 #Retrieve all records from database
 def view():
-    conn=sqlite3.connect(db_file)
-    cur=conn.cursor()
-    cur.execute("SELECT * FROM book_records")
-    rows=cur.fetchall()
-    conn.close()
-    return rows
+    return books.view()
 
 #Search record from database
 def search(title, author, year, isbn):
-    conn=sqlite3.connect(db_file)
-    cur=conn.cursor()
-    
-    command = "SELECT * FROM book_records"
-    col = ["title", "author", "year", "isbn"]
-    parameter = [title, author, year, isbn]
-    command_p = []
-    first_para = True
-    
-    if not all (field=="" for field in parameter):   #SAME AS if not all([title=="", author=="", year=="", isbn==""]):
-        command = command + " WHERE"
-        for idx, value in enumerate (parameter):
-            if value!="":
-                if first_para == False: 
-                    command = command + " AND"
-                command = command + " " + col[idx] + "=?"
-                command_p.append(value)
-                first_para = False                
-
-    cur.execute(command,command_p)
-    rows=cur.fetchall()
-    conn.close()
-    return rows
+    return books.search(title, author, year, isbn)
+
+#Retrieve up to limit matching records after record `after`, in title order
+def page(title, author, year, isbn, after=None, limit=100):
+    return books.page(title, author, year, isbn, after, limit)
+
+#Full-text search of title, author and ISBN words and word prefixes, best match first
+def match(text, year="", limit=100, offset=0):
+    return books.match(text, year, limit, offset)
 
 
 # In[4]:
 
 
-#View all records in database and display it on the GUI
+#View all records in database and display it on the GUI. Records are
+#fetched a page at a time as the listbox is scrolled.
 def view_records():
-    for idx in reversed(range(t1.size())):        #Same as t1.delete(0.END)
-        t1.delete(idx)                             
-    for idx, book in enumerate (view(), start=1):
-        t1.insert(idx, " [" + str(idx) + "] " + book[0] + ", " + book[1] + ", " + str(book[2]) + ", " + book[3] + "\n")
+    records.load(lambda after, limit: page("", "", "", "", after, limit))
     status.set("")
 
 #Add record into the datbase with info entered from the GUI.
@@ -119,9 +86,7 @@ def add_records():
     isbn_str = str(isbn.get())
 
     if not any([title_str=="", author_str=="", isbn_str=="", year_str==""]):
-        current_record = search(title_str, author_str, year_str, isbn_str)
-        if len(current_record) == 0:
-            insert(title_str, author_str, year_str, isbn_str)
+        if insert(title_str, author_str, year_str, isbn_str):   #Unique index rejects duplicates
             all_record = True
             view_records()
             status.set("Record added successfully.")
@@ -139,17 +104,12 @@ def update_records():
     isbn_str = str(isbn.get())
     
     if not any([title_str=="", author_str=="", isbn_str=="", year_str==""]):
-        new_record = search(title_str, author_str, year_str, isbn_str)
-        if len(new_record) == 0:
-            idx = t1.curselection()[0]  #Index of selection
-            current_record = t1.get(idx)
-            current_record = current_record.strip('\n')
-            current_record = current_record.split("] ", 1)
-            current_record = current_record[1].split(", ", 3)
-            
-            update(title_str, author_str, year_str, isbn_str, 
-                   current_record[0], current_record[1], 
-                   current_record[2], current_record[3])
+        idx = t1.curselection()[0]  #Index of selection
+        current_record = records.get(idx)
+        
+        if update(title_str, author_str, year_str, isbn_str,   #Unique index rejects duplicates
+                  current_record[0], current_record[1], 
+                  current_record[2], current_record[3]):
             all_record = True
             view_records()
             status.set("Record updated successfully.")
@@ -170,18 +130,19 @@ def delete_records():
 
 #Search record from the database that matches with title, author, 
 #year and ISBN info entered in the GUI. Any one or more field 
-#can be used for the search.
+#can be used for the search. With fuzzy search, records containing
+#the words entered (or words starting with them) are found instead.
 def search_records():
     title_str = str(title.get())
     author_str = str(author.get())
     year_str = str(year.get())
     isbn_str = str(isbn.get())
-    rows = search(title_str, author_str, year_str, isbn_str)
 
-    for idx in reversed(range(t1.size())):
-        t1.delete(idx)
-    for idx, book in enumerate (rows, start=1):
-        t1.insert(idx, " [" + str(idx) + "] " + book[0] + ", " + book[1] + ", " + str(book[2]) + ", " + book[3] + "\n")
+    if fuzzy.get():
+        text = " ".join([title_str, author_str, isbn_str])
+        records.load(lambda after, limit: match(text, year_str, limit, len(records.records)))
+    else:
+        records.load(lambda after, limit: page(title_str, author_str, year_str, isbn_str, after, limit))
     status.set("")
 
 #Callback function to display record details user selected in the listbox.
@@ -189,10 +150,7 @@ def callback(event):
     selection = event.widget.curselection()
     if selection:
         idx = selection[0]
-        book = t1.get(idx)
-        book = book.strip('\n')
-        book = book.split("] ", 1)
-        book = book[1].split(", ", 3)
+        book = records.get(idx)
         
         title.set(book[0])
         author.set(book[1])
@@ -239,9 +197,9 @@ scrollbar = Scrollbar(root)             #Scroll bar for record listbox
 scrollbar.grid(row=2, column=4, rowspan=4, sticky='ns')
 
 #Record listbox
-t1 = Listbox(root, height=7, width=55, yscrollcommand = scrollbar.set)
+t1 = Listbox(root, height=7, width=55)
 t1.grid(row=2, column=0, rowspan=4, columnspan=4)
-scrollbar.config(command = t1.yview) 
+records = Record_List(t1, scrollbar)    #Pages records into the listbox and links the scroll bar
 t1.bind("<<ListboxSelect>>", callback)
 
 #View all record button
@@ -268,6 +226,10 @@ b5.grid(row=4, column=5)
 b6 = Button(root, text="Close", width=12, command=root.destroy)
 b6.grid(row=5, column=5)
 
+fuzzy = IntVar()
+c1 = Checkbutton(root, text="Fuzzy search", variable=fuzzy)   #Search entry by words instead of exact fields
+c1.grid(row=6, column=5)
+
 status = StringVar()
 l5 = Label(root, textvariable=status)    #Status Label
 l5.grid(row=6, column=0, columnspan=4)
@@ -0,0 +1,153 @@
+import csv
+import sys
+import json
+import time
+import argparse
+from books_db import Books_db
+
+FIELDS = ["title", "author", "year", "isbn"]
+
+#Import book records from a csv file (with a title,author,year,isbn header), a json
+#array or a json lines file. Records are read as a stream and inserted in batches of
+#batch_size records, one transaction per batch. Like adding records in the GUI,
+#records with a missing field are skipped and records that already exist are not
+#added again. Returns counts of records read, inserted, duplicated and invalid.
+def import_records(books_db, path, batch_size=10000, progress=None):
+    stats = {"read": 0, "inserted": 0, "duplicates": 0, "invalid": 0}
+    start = time.perf_counter()
+    batch = []
+    for record in read_records(path):
+        stats["read"] += 1
+        row = clean_record(record)
+        if row is None:
+            stats["invalid"] += 1
+            continue
+        batch.append(row)
+        if len(batch) >= batch_size:
+            insert_batch(books_db, batch, stats)
+            batch = []
+            if progress:
+                progress(report(stats, start))
+    if batch:
+        insert_batch(books_db, batch, stats)
+    return finish(stats, start)
+
+#Export all book records to a csv, json or json lines file, reading the database in
+#chunks of chunk_size records. Returns number of records exported.
+def export_records(books_db, path, chunk_size=10000, progress=None):
+    stats = {"exported": 0}
+    start = time.perf_counter()
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        if path.endswith(".csv"):
+            writer = csv.writer(f)
+            writer.writerow(FIELDS)
+        elif path.endswith(".json"):
+            f.write("[")
+        for rows in books_db.iter_records(chunk_size):
+            if path.endswith(".csv"):
+                writer.writerows(rows)
+            else:
+                lines = [json.dumps(dict(zip(FIELDS, row)), ensure_ascii=False) for row in rows]
+                if path.endswith(".json"):
+                    f.write(("," if stats["exported"] else "") + "\n" + ",\n".join(lines))
+                else:
+                    f.write("\n".join(lines) + "\n")
+            stats["exported"] += len(rows)
+            if progress:
+                progress(report(stats, start))
+        if path.endswith(".json"):
+            f.write("\n]\n")
+    return finish(stats, start)
+
+#Insert a batch of records and count inserted and duplicate records
+def insert_batch(books_db, batch, stats):
+    inserted = books_db.insert_many(batch)
+    stats["inserted"] += inserted
+    stats["duplicates"] += len(batch) - inserted
+
+#Return (title, author, year, isbn) of a record, or None if a field is missing or the year is not a number
+def clean_record(record):
+    values = [str(record.get(field, "") or "").strip() for field in FIELDS]
+    if any(value == "" for value in values):
+        return None
+    try:
+        values[2] = int(values[2])
+    except ValueError:
+        return None
+    return tuple(values)
+
+#Stream records (dicts) from a csv, json array or json lines file
+def read_records(path):
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        if path.endswith(".csv"):
+            yield from csv.DictReader(f)
+        elif path.endswith(".json"):
+            yield from read_json_array(f)
+        else:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+#Stream the objects of a json array without loading the whole file
+def read_json_array(f, chunk_size=1 << 16):
+    decoder = json.JSONDecoder()
+    buffer = ""
+    started = False
+    while True:
+        chunk = f.read(chunk_size)
+        buffer += chunk
+        pos = 0
+        while True:
+            while pos < len(buffer) and buffer[pos] in " \t\r\n,":
+                pos += 1
+            if not started and pos < len(buffer):
+                if buffer[pos] != "[":
+                    raise ValueError("Expected a json array of records")
+                started = True
+                pos += 1
+                continue
+            if pos < len(buffer) and buffer[pos] == "]":
+                return
+            try:
+                record, pos = decoder.raw_decode(buffer, pos)
+            except ValueError:
+                break  #Record continues in the next chunk
+            yield record
+        buffer = buffer[pos:]
+        if not chunk:
+            if buffer.strip():
+                raise ValueError("Unexpected end of json array")
+            return
+
+#Progress line with records per second
+def report(stats, start):
+    seconds = time.perf_counter() - start
+    done = stats.get("read", stats.get("exported", 0))
+    return ", ".join("%s %d" % item for item in stats.items()) + " (%.0f records/s)" % (done / seconds if seconds > 0 else 0)
+
+#Add time and records per second to stats
+def finish(stats, start):
+    stats["seconds"] = round(time.perf_counter() - start, 3)
+    done = stats.get("read", stats.get("exported", 0))
+    stats["records_per_s"] = round(done / stats["seconds"]) if stats["seconds"] > 0 else 0
+    return stats
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk import/export of book records.")
+    parser.add_argument("action", choices=["import", "export"])
+    parser.add_argument("file", help="csv, json or jsonl file")
+    parser.add_argument("--db", default="mybooks.db", help="database file (default: mybooks.db)")
+    parser.add_argument("--batch", type=int, default=10000, help="records per transaction/chunk")
+    parser.add_argument("--quiet", action="store_true", help="no progress output")
+    args = parser.parse_args()
+
+    books_db = Books_db(args.db)
+    progress = None if args.quiet else lambda line: print(line, file=sys.stderr)
+    if args.action == "import":
+        stats = import_records(books_db, args.file, args.batch, progress)
+    else:
+        stats = export_records(books_db, args.file, args.batch, progress)
+    print(json.dumps(stats))
+
+if __name__ == "__main__":
+    main()
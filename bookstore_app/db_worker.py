@@ -0,0 +1,148 @@
+import re
+import queue
+import threading
+import unicodedata
+from collections import OrderedDict
+
+READS = ["page", "match", "search", "view", "exists"]
+
+class DB_Worker():
+    """
+    This class runs Books_db calls on a background thread so a slow query or disk sync
+    does not freeze the Tk window. Calls are queued with request() and run in order.
+    Their results are handed back on the Tk thread, polled with root.after, by calling
+    the request's callback. Results of reads are cached. A write only drops the cached
+    results its inserted, deleted or updated records could appear in, so repeating any
+    other search is served from the cache.
+    """
+    def __init__(self, books_db, root, poll_ms=20, cache_size=256):
+        self.books_db = books_db
+        self.root = root
+        self.poll_ms = poll_ms  #Milliseconds between checks for results
+        self.cache_size = cache_size  #Most read results kept
+        self.cache = OrderedDict()  #(method, args) -> result, least recently used first
+        self.hits = 0
+        self.misses = 0
+        self.requests = queue.Queue()
+        self.results = queue.Queue()
+
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        self.root.after(self.poll_ms, self.poll)
+
+    #Queue a call of Books_db method with args. callback(result) or error(exception) is
+    #called on the Tk thread when it is done.
+    def request(self, method, *args, callback=None, error=None):
+        self.requests.put((method, args, callback, error))
+
+    #Stop the worker thread after the queued requests
+    def close(self):
+        self.requests.put(None)
+        self.thread.join()
+
+    #Worker thread: run requests until closed
+    def run(self):
+        while True:
+            item = self.requests.get()
+            if item is None:
+                break
+            method, args, callback, error = item
+            try:
+                result = self.call(method, args)
+            except Exception as e:
+                self.results.put((error, e, True))
+            else:
+                self.results.put((callback, result, False))
+
+    #Run a request, through the cache for reads
+    def call(self, method, args):
+        if method in READS:
+            key = (method, args)
+            if key in self.cache:
+                self.hits += 1
+                self.cache.move_to_end(key)
+                return self.cache[key]
+            self.misses += 1
+            result = getattr(self.books_db, method)(*args)
+            self.cache[key] = result
+            if len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+            return result
+
+        result = getattr(self.books_db, method)(*args)
+        if method == "insert_many":
+            changed = [as_record(*record) for record in args[0]] if result else []
+        elif method == "update":
+            changed = [as_record(*args[:4]), as_record(*args[4:])] if result else []
+        else:
+            changed = [as_record(*args)] if result else []
+        self.invalidate(changed)
+        return result
+
+    #Drop cached results that any of the changed records could appear in
+    def invalidate(self, changed):
+        if not changed:
+            return
+        for key in list(self.cache):
+            method, args = key
+            if any(affects(record, method, args, self.cache[key]) for record in changed):
+                del self.cache[key]
+
+    #Tk thread: hand results to their callbacks
+    def poll(self):
+        self.root.after(self.poll_ms, self.poll)
+        while True:
+            try:
+                handler, result, failed = self.results.get_nowait()
+            except queue.Empty:
+                break
+            if handler is not None:
+                handler(result)
+            elif failed:
+                raise result
+
+#Record tuple as stored in the database, with the year as a number
+def as_record(title, author, year, isbn):
+    try:
+        year = int(year)
+    except ValueError:
+        pass
+    return (title, author, year, isbn)
+
+#Function telling if a record belongs in the results of a Books_db read method called
+#with args, not counting paging. Full-text matches are checked by substring, which
+#accepts every record the full-text index matches (and a few it does not).
+def record_filter(method, args):
+    if method in ["page", "search"]:
+        fields = as_record(*args[:4])
+        return lambda record: all(value == "" or value == field for value, field in zip(fields, record))
+    if method == "match":
+        words = [fold(word) for word in re.findall(r"\w+", args[0])]
+        year = as_record("", "", args[1] if len(args) > 1 else "", "")[2]
+        return lambda record: ((year == "" or year == record[2]) and
+                               all(word in fold(" ".join([record[0], record[1], record[3]])) for word in words))
+    if method == "exists":
+        fields = as_record(*args[:4])
+        return lambda record: record == fields
+    return lambda record: True
+
+#Check if adding or removing record could change the cached result of a read
+def affects(record, method, args, result):
+    if not record_filter(method, args)(record):
+        return False
+    if method == "page":
+        after = args[4] if len(args) > 4 else None
+        limit = args[5] if len(args) > 5 else 100
+        try:
+            if after is not None and record <= tuple(after):
+                return False
+            #A full page only ends before the record if its last record sorts before it
+            return len(result) < limit or record <= tuple(result[-1])
+        except TypeError:  #Year stored as text, compare conservatively
+            return True
+    return True
+
+#Lower case text without accents, as the full-text index compares words
+def fold(text):
+    text = unicodedata.normalize("NFKD", text.lower())
+    return "".join(c for c in text if not unicodedata.combining(c))
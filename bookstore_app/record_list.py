@@ -0,0 +1,121 @@
+from bisect import bisect_left
+from tkinter import END
+
+class Record_List():
+    """
+    This class shows book records in a listbox one page at a time. Only the visible
+    rows plus a prefetch margin are fetched when records are loaded, and more rows are
+    fetched as the user scrolls near the end of the loaded rows. Rows are fetched with
+    a fetch(after, limit) function returning up to limit records after record `after`
+    (None for the first page), e.g. Books_db.page. Fetch functions that page by
+    position instead, e.g. Books_db.match, can use len(records) as the offset. The
+    records behind the rows are kept, so a selected row is returned as its record
+    without parsing the row text. With asynchronous=True the fetch function is called
+    as fetch(after, limit, done) and passes the records to done() later, e.g. from a
+    DB_Worker. After a record is added, updated or deleted, only the rows from its
+    position on are redrawn instead of loading the records again.
+    """
+    def __init__(self, listbox, scrollbar, page_size=None, margin=None):
+        self.listbox = listbox
+        self.scrollbar = scrollbar
+        self.page_size = page_size or int(listbox.cget("height"))  #Rows visible at once
+        self.margin = margin or 5 * self.page_size  #Rows fetched ahead of the view
+        self.records = []  #Records of the listbox rows
+        self.fetch = None
+        self.contains = None  #Function telling if a record belongs in the list
+        self.ordered = True  #Records are in title, author, year, ISBN order
+        self.asynchronous = False
+        self.waiting = False  #Waiting for records from an asynchronous fetch
+        self.generation = 0  #Number of loads, to ignore records of an earlier load
+        self.complete = True  #All records have been fetched
+
+        self.listbox.config(yscrollcommand=self.scrolled)
+        self.scrollbar.config(command=self.listbox.yview)
+
+    #Show records from a new fetch function, starting with the first page. contains(record)
+    #tells if an added or updated record belongs in the list, and ordered tells if the
+    #records come in title, author, year, ISBN order (else added records are not shown).
+    def load(self, fetch, contains=None, ordered=True, asynchronous=False):
+        self.fetch = fetch
+        self.contains = contains
+        self.ordered = ordered
+        self.asynchronous = asynchronous
+        self.generation += 1
+        self.waiting = False
+        self.records = []
+        self.complete = False
+        self.listbox.delete(0, END)
+        self.fetch_more(self.page_size + self.margin)
+
+    #Fetch and add up to count more records
+    def fetch_more(self, count):
+        if self.complete or self.waiting:
+            return
+        after = self.records[-1] if self.records else None
+        if not self.asynchronous:
+            self.add(self.fetch(after, count), count)
+            return
+
+        generation = self.generation
+        def done(records):
+            if generation == self.generation:
+                self.add(records, count)
+        self.waiting = True
+        self.fetch(after, count, done)
+
+    #Add fetched records below the rows
+    def add(self, records, count):
+        self.waiting = False
+        self.complete = len(records) < count
+        start = len(self.records)
+        self.records.extend(records)
+        if records:
+            self.listbox.insert(END, *[format_record(idx, book) for idx, book in enumerate(records, start=start + 1)])
+
+    #Listbox scrolled: update scrollbar and fetch more records when near the end
+    def scrolled(self, first, last):
+        self.scrollbar.set(first, last)
+        rows_below = (1.0 - float(last)) * len(self.records)
+        if not self.complete and rows_below < self.margin:
+            self.fetch_more(self.margin)
+
+    #Record of row idx
+    def get(self, idx):
+        return self.records[idx]
+
+    #Show a record added to the database, if it belongs in the list and its position is loaded
+    def insert_record(self, record):
+        if not self.ordered or (self.contains and not self.contains(record)):
+            return
+        idx = bisect_left(self.records, record)
+        if idx == len(self.records) and not self.complete:
+            return  #Fetched when scrolled to
+        self.records.insert(idx, record)
+        self.redraw(idx)
+
+    #Remove a record deleted from the database
+    def remove_record(self, record):
+        if record in self.records:
+            idx = self.records.index(record)
+            del self.records[idx]
+            self.redraw(idx)
+
+    #Show a record updated in the database in place of its old values
+    def replace_record(self, old, new):
+        if not self.ordered and old in self.records and (self.contains is None or self.contains(new)):
+            idx = self.records.index(old)
+            self.records[idx] = new
+            self.redraw(idx)
+        else:
+            self.remove_record(old)
+            self.insert_record(new)
+
+    #Rewrite rows from idx on, whose numbers changed
+    def redraw(self, idx):
+        self.listbox.delete(idx, END)
+        if idx < len(self.records):
+            self.listbox.insert(END, *[format_record(i, book) for i, book in enumerate(self.records[idx:], start=idx + 1)])
+
+#Listbox text of a record
+def format_record(idx, book):
+    return " [%d] %s, %s, %s, %s\n" % (idx, book[0], book[1], book[2], book[3])
@@ -0,0 +1,80 @@
+import os
+import json
+import time
+import random
+import argparse
+import tempfile
+from books_db import Books_db
+
+WORDS = ["cat", "dog", "moon", "river", "garden", "night", "secret", "winter", "ocean", "little",
+         "house", "stone", "dragon", "city", "journey", "silver", "forest", "shadow", "letter", "island"]
+NAMES = ["Smith", "Johnson", "Brown", "Garcia", "Miller", "Davis", "Wilson", "Taylor", "Clark", "Lewis"]
+
+#Deterministic synthetic catalog of n records
+def make_records(n, seed=0):
+    rng = random.Random(seed)
+    for i in range(n):
+        title = " ".join(rng.choice(WORDS) for _ in range(rng.randint(2, 5))).capitalize() + " %d" % i
+        author = "%s %s" % (rng.choice(NAMES)[0], rng.choice(NAMES))
+        yield (title, author, rng.randint(1900, 2024), "978%010d" % i)
+
+#Median and worst time of running query() `repeat` times, in milliseconds
+def time_query(query, repeat=5):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        rows = query()
+        times.append((time.perf_counter() - start) * 1000)
+    times.sort()
+    return {"rows": len(rows), "median_ms": round(times[len(times) // 2], 3), "max_ms": round(times[-1], 3)}
+
+#Compare equality search() with full-text match() on a catalog of n records
+def run_benchmark(n=1000000, seed=0, page_size=100):
+    with tempfile.TemporaryDirectory() as folder:
+        books_db = Books_db(os.path.join(folder, "books.db"))
+        start = time.perf_counter()
+        batch = []
+        for i, record in enumerate(make_records(n, seed)):
+            batch.append(record)
+            if i == n // 2:
+                title, author, year, isbn = record  #Record searched for
+            if len(batch) == 10000:
+                books_db.insert_many(batch)
+                batch = []
+        books_db.insert_many(batch)
+        load_seconds = time.perf_counter() - start
+
+        results = {
+            "records": n,
+            "load_s": round(load_seconds, 1),
+            "db_mb": round(os.path.getsize(os.path.join(folder, "books.db")) / 2 ** 20, 1),
+            #Current search needs the exact field values
+            "search_exact_title": time_query(lambda: books_db.search(title, "", "", "")),
+            "search_exact_author": time_query(lambda: books_db.search("", author, "", "")),
+            "search_author_and_year": time_query(lambda: books_db.search("", author, year, "")),
+            #What a partial title costs without an index: a LIKE scan of the whole table for a
+            #rare part (the title number), which cannot stop after a page of early matches
+            "like_scan_title_number": time_query(lambda: books_db.connection().execute(
+                "SELECT * FROM book_records WHERE title LIKE ? LIMIT ?", ("%" + title.split()[-1] + "%", page_size)).fetchall()),
+            #Full-text search, first page and a later page
+            "match_title_words": time_query(lambda: books_db.match(" ".join(title.split()[:2]), limit=page_size)),
+            "match_common_word": time_query(lambda: books_db.match(title.split()[0], limit=page_size)),
+            "match_title_prefix": time_query(lambda: books_db.match(title.split()[0][:3], limit=page_size)),
+            "match_title_prefix_page_10": time_query(lambda: books_db.match(title.split()[0][:3], limit=page_size, offset=9 * page_size)),
+            "match_author_and_title": time_query(lambda: books_db.match(author.split()[1] + " " + title.split()[0], limit=page_size)),
+            "match_isbn": time_query(lambda: books_db.match(isbn, limit=page_size)),
+            "match_rare_words": time_query(lambda: books_db.match(title, limit=page_size)),
+        }
+        books_db.close()
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark equality search against full-text search of book records.")
+    parser.add_argument("-n", "--records", type=int, default=1000000, help="records in the synthetic catalog")
+    parser.add_argument("--page", type=int, default=100, help="records per result page")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    print(json.dumps(run_benchmark(args.records, args.seed, args.page), indent=2))
+
+if __name__ == "__main__":
+    main()
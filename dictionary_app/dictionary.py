@@ -0,0 +1,321 @@
+import os
+import sys
+import mmap
+import json
+from array import array
+from difflib import SequenceMatcher, get_close_matches
+
+FILE_MAGIC = b'DICTFILE1\n'
+
+class Suggestion_Index():
+    """
+    This class suggests dictionary words close to a misspelled word. It is a SymSpell
+    style deletion index built once from the dictionary keys: every word is stored
+    under each string left after deleting up to max_distance characters from its first
+    prefix_length characters. Two words within d edits both leave a common string after
+    at most d deletions, so a lookup only generates the deletions of the misspelled word
+    and checks the few words stored under them, instead of comparing the word with every
+    key like get_close_matches. Closer words are searched first, one edit at a time, and
+    the search stops once n suggestions are found. Suggestions are ranked by edit
+    distance (insert, delete, replace or swap of adjacent characters), then by difflib
+    similarity. Like get_close_matches, words less similar than cutoff are never
+    suggested, so short junk words get no suggestion. Keys are matched
+    case-insensitively. The index is built on the first suggest(), so a dictionary
+    that is only used for exact lookups never builds it.
+    """
+    def __init__(self, words, max_distance=2, prefix_length=7, cutoff=0.6):
+        self.source = words  #Dictionary keys the index is built from
+        self.max_distance = max_distance
+        self.cutoff = cutoff  #Lowest difflib similarity ratio suggested
+        self.prefix_length = prefix_length
+        self.words = None  #Lower case word -> dictionary keys
+        self.deletes = None  #Deletion -> lower case words, by characters deleted
+
+    #Build the index from the dictionary keys. The index is only set once it is complete,
+    #so threads looking up words never see half an index.
+    def build(self):
+        words = {}
+        deletes = [{} for _ in range(self.max_distance + 1)]
+        for key in self.source:
+            word = key.lower()
+            if word in words:
+                words[word].append(key)
+                continue
+            words[word] = [key]
+            for deleted, edits in enumerate(self.edits(word[:self.prefix_length])):
+                for delete in edits:
+                    found = deletes[deleted].get(delete)
+                    if found is None:
+                        deletes[deleted][delete] = word  #A single word is not wrapped in a list
+                    elif isinstance(found, list):
+                        found.append(word)
+                    else:
+                        deletes[deleted][delete] = [found, word]
+        self.words = words
+        self.deletes = deletes
+
+    #Strings left after deleting 0, 1, ... max_distance characters from word, each string
+    #listed with the fewest deletions it takes
+    def edits(self, word):
+        edits = [{word}]
+        seen = {word}
+        for _ in range(self.max_distance):
+            last = {w[:i] + w[i + 1:] for w in edits[-1] for i in range(len(w))} - seen
+            seen |= last
+            edits.append(last)
+        return edits
+
+    #Up to n dictionary keys closest to word, best first
+    def suggest(self, word, n=3):
+        if self.deletes is None:
+            self.build()
+        lower = word.lower()
+        edits = self.edits(lower[:self.prefix_length])
+        bits = char_bits(lower)
+        letters = set(lower)
+        checked = set()
+        found = []  #(distance, -similarity, key)
+        for distance in range(self.max_distance + 1):
+            #Words within `distance` edits are stored under a string left after up to
+            #`distance` deletions
+            candidates = set()
+            for typo_deleted in range(distance + 1):
+                for word_deleted in range(distance + 1):
+                    if max(typo_deleted, word_deleted) != distance:
+                        continue
+                    for delete in edits[typo_deleted]:
+                        words = self.deletes[word_deleted].get(delete)
+                        if words is None:
+                            continue
+                        if isinstance(words, list):
+                            candidates.update(words)
+                        else:
+                            candidates.add(words)
+            for candidate in candidates - checked:
+                if abs(len(candidate) - len(lower)) > self.max_distance:
+                    continue
+                #Every letter of one word missing from the other takes an edit (prunes about half)
+                candidate_letters = set(candidate)
+                if (len(candidate_letters - letters) > self.max_distance
+                        or len(letters - candidate_letters) > self.max_distance):
+                    continue
+                d = edit_distance(lower, candidate, bits)
+                if d <= self.max_distance:
+                    for key in self.words[candidate]:
+                        ratio = SequenceMatcher(None, key, word).ratio()
+                        if ratio >= self.cutoff:
+                            found.append((d, -ratio, key))
+            checked |= candidates
+            if sum(d <= distance for d, ratio, key in found) >= n:
+                break  #Words not checked yet are further away
+
+        found.sort(key=lambda r: r[2], reverse=True)  #Ties in the same order as get_close_matches
+        found.sort(key=lambda r: r[:2])
+        return [key for d, ratio, key in found[:n]]
+
+#Character -> bits of its positions in word
+def char_bits(word):
+    bits = {}
+    for i, c in enumerate(word):
+        bits[c] = bits.get(c, 0) | (1 << i)
+    return bits
+
+#Edit distance of a and b counting inserts, deletes, replaces and swaps of adjacent
+#characters (optimal string alignment). Bit-parallel algorithm of Hyyro (2003): the
+#columns of the edit distance table are kept as bits of Python integers. Pass
+#char_bits(a) when comparing a with many words.
+def edit_distance(a, b, bits=None):
+    m = len(a)
+    if m == 0:
+        return len(b)
+    peq = bits if bits is not None else char_bits(a)
+    mask = (1 << m) - 1
+    high = 1 << (m - 1)
+    vp, vn, d0, pm_last = mask, 0, 0, 0
+    distance = m
+    for c in b:
+        pm = peq.get(c, 0)
+        tr = ((~d0 & pm) << 1) & pm_last  #Swaps of adjacent characters
+        d0 = ((((pm & vp) + vp) & mask) ^ vp) | pm | vn | tr
+        hp = vn | (~(d0 | vp) & mask)
+        hn = d0 & vp
+        if hp & high:
+            distance += 1
+        elif hn & high:
+            distance -= 1
+        hp = ((hp << 1) | 1) & mask
+        hn = (hn << 1) & mask
+        vp = hn | (~(d0 | hp) & mask)
+        vn = hp & d0
+        pm_last = pm
+    return distance
+
+class Dictionary_File():
+    """
+    This class reads a dictionary file built by build_dictionary_file(). It works like
+    the dictionary loaded from data.json (in, [], get, keys, len) but the file is memory
+    mapped instead of read: opening it only maps the file and a word lookup is a binary
+    search of the sorted keys, so only the pages touched are read from disk and only the
+    definitions returned are decoded.
+    File layout: magic line, number of words n, n + 1 entry offsets, n key end offsets
+    (little-endian uint32, from the start of the file), then the entries sorted by key,
+    each the utf-8 key followed by its definitions as json.
+    """
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.mm[:len(FILE_MAGIC)] != FILE_MAGIC:
+            raise ValueError("%s is not a dictionary file" % path)
+        self.count = int.from_bytes(self.mm[len(FILE_MAGIC):len(FILE_MAGIC) + 4], 'little')
+        start = len(FILE_MAGIC) + 4
+        self.starts = self.offsets(start, self.count + 1)
+        self.key_ends = self.offsets(start + 4 * (self.count + 1), self.count)
+
+    #Array of count uint32 offsets at position start, not copied on little-endian machines
+    def offsets(self, start, count):
+        view = memoryview(self.mm)[start:start + 4 * count]
+        if sys.byteorder == 'little':
+            return view.cast('I')
+        values = array('I', view)
+        values.byteswap()
+        return values
+
+    #Key of entry i as bytes
+    def key_bytes(self, i):
+        return self.mm[self.starts[i]:self.key_ends[i]]
+
+    #Entry index of key, or -1
+    def find(self, key):
+        target = key.encode('utf-8')
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.key_bytes(mid) < target:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo if lo < self.count and self.key_bytes(lo) == target else -1
+
+    def __contains__(self, key):
+        return self.find(key) >= 0
+
+    def __getitem__(self, key):
+        i = self.find(key)
+        if i < 0:
+            raise KeyError(key)
+        return json.loads(self.mm[self.key_ends[i]:self.starts[i + 1]])
+
+    def get(self, key, default=None):
+        i = self.find(key)
+        return default if i < 0 else json.loads(self.mm[self.key_ends[i]:self.starts[i + 1]])
+
+    def __len__(self):
+        return self.count
+
+    #Keys in sorted order, decoded as they are read
+    def keys(self):
+        for i in range(self.count):
+            yield self.key_bytes(i).decode('utf-8')
+
+    __iter__ = keys
+
+    def close(self):
+        if isinstance(self.starts, memoryview):
+            self.starts.release()
+            self.key_ends.release()
+        self.mm.close()
+
+#Compile a json dictionary (word -> definitions) into a dictionary file for Dictionary_File.
+#Returns the number of words.
+def build_dictionary_file(json_path, path):
+    with open(json_path, 'r') as f:
+        dic = json.loads(f.read())
+    entries = sorted((key.encode('utf-8'), json.dumps(value, ensure_ascii=False).encode('utf-8'))
+                     for key, value in dic.items())
+    starts = array('I')
+    key_ends = array('I')
+    position = len(FILE_MAGIC) + 4 + 4 * (2 * len(entries) + 1)
+    for key, value in entries:
+        starts.append(position)
+        key_ends.append(position + len(key))
+        position += len(key) + len(value)
+    starts.append(position)
+    if sys.byteorder != 'little':
+        starts.byteswap()
+        key_ends.byteswap()
+
+    with open(path + '.tmp', 'wb') as f:  #Replaced in one step, so a reader never sees half a file
+        f.write(FILE_MAGIC)
+        f.write(len(entries).to_bytes(4, 'little'))
+        f.write(starts.tobytes())
+        f.write(key_ends.tobytes())
+        for key, value in entries:
+            f.write(key)
+            f.write(value)
+    os.replace(path + '.tmp', path)
+    return len(entries)
+
+#Open the dictionary file compiled from json_path, compiling it first if it is missing
+#or older than the json file. The file is path, or json_path with a .dict extension.
+def open_dictionary(json_path, path=None):
+    path = path or os.path.splitext(json_path)[0] + '.dict'
+    if os.path.exists(json_path) and (not os.path.exists(path)
+                                      or os.path.getmtime(path) < os.path.getmtime(json_path)):
+        build_dictionary_file(json_path, path)
+    return Dictionary_File(path)
+
+#Open a dictionary: a dictionary file if path is one, else a json file loaded in memory
+def load_dictionary(path):
+    with open(path, 'rb') as f:
+        magic = f.read(len(FILE_MAGIC))
+    if magic == FILE_MAGIC:
+        return Dictionary_File(path)
+    with open(path, 'r') as f:
+        return json.loads(f.read())
+
+#Look up the definitions of word in dic without asking the user, trying lower case, title
+#case and upper case. A word that is not found is checked for misspelling with index (or
+#get_close_matches if no index is given). Returns a dict with the dictionary key found
+#(None if not found), its definitions and up to n suggested keys for a word not found.
+def lookup(word, dic, index=None, n=3):
+    #All lower case, begins with capital, all capitals (i.e. USA)
+    for key in (word.lower(), word.title(), word.upper()):
+        definitions = dic.get(key)
+        if definitions is not None:
+            return {"word": word, "key": key, "definitions": definitions, "suggestions": []}
+    suggestions = index.suggest(word, n) if index else get_close_matches(word, dic.keys(), n)
+    return {"word": word, "key": None, "definitions": None, "suggestions": suggestions}
+
+#Look up the definitions of word in dic, trying lower case, title case and upper case.
+#A word that is not found is checked for misspelling with index (or get_close_matches
+#if no index is given) and the user is asked with confirm() to accept the closest word.
+def translate(word, dic, index=None, confirm=input):
+    result = lookup(word, dic, index, 1)
+    if result["key"] is not None:
+        return result["definitions"]
+    elif len(w:=result["suggestions"]) > 0:   #Suggests closest words
+        confirmation = confirm ("Do you mean the word \"%s\" instead? [y/n] " % w[0])
+        if confirmation.lower() == 'y':
+            return (dic[w[0]])
+        elif confirmation.lower() == 'n':
+            return "The word was not found in dictionary! Please double check spelling."
+        else:
+            return "Sorry, we didn't understand your entry."
+    else:
+        return "The word was not found in dictionary! Please double check spelling."
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description="Dictionary app tools.")
+    commands = parser.add_subparsers(dest='command', required=True)
+    build = commands.add_parser('build', help="compile a json dictionary into a dictionary file")
+    build.add_argument('json', help="json dictionary, e.g. data.json")
+    build.add_argument('out', help="dictionary file to write, e.g. data.dict")
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        print("%d words written to %s" % (build_dictionary_file(args.json, args.out), args.out))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,144 @@
+import sys
+import json
+import time
+import argparse
+import threading
+from functools import lru_cache
+from urllib.parse import urlparse, parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from dictionary import lookup, open_dictionary, load_dictionary, Suggestion_Index
+
+class Translator():
+    """
+    This class answers word lookups from a dictionary opened once, for translating word
+    lists and for the query server. Results, including the suggestions for misspelled
+    words, are kept in an LRU cache of cache_size words so hot words are answered
+    without a lookup. It can be used from many threads at once. Lookups and cache hits
+    are counted for throughput reports.
+    """
+    def __init__(self, path, suggestions=3, cache_size=10000):
+        if path.endswith('.json'):
+            self.dic = open_dictionary(path)  #Compiled to a dictionary file once
+        else:
+            self.dic = load_dictionary(path)
+        self.index = Suggestion_Index(self.dic)
+        self.suggestions = suggestions  #Suggestions for a word not found
+        self.lookups = 0
+        self.index_build_s = None
+        self.started = time.perf_counter()
+        self.lock = threading.Lock()
+        self.cached_lookup = lru_cache(maxsize=cache_size)(self.uncached_lookup)
+
+    #Build the suggestion index now instead of on the first misspelled word. Throughput
+    #is counted from here on.
+    def warm_up(self):
+        start = time.perf_counter()
+        self.index.build()
+        self.started = time.perf_counter()
+        self.index_build_s = round(self.started - start, 3)
+
+    #Result of looking up word (see dictionary.lookup)
+    def lookup(self, word):
+        with self.lock:
+            self.lookups += 1
+        return self.cached_lookup(word.strip())
+
+    def uncached_lookup(self, word):
+        return lookup(word, self.dic, self.index, self.suggestions)
+
+    #Lookup counts and rate since started
+    def stats(self):
+        info = self.cached_lookup.cache_info()
+        seconds = time.perf_counter() - self.started
+        return {"lookups": self.lookups,
+                "cache_hits": info.hits,
+                "cached_words": info.currsize,
+                "seconds": round(seconds, 3),
+                "lookups_per_s": round(self.lookups / seconds) if seconds > 0 else 0,
+                "index_build_s": self.index_build_s}
+
+#Translate words (one per line) from files or stdin, writing one json result per line
+def translate_batch(translator, lines, out):
+    for line in lines:
+        word = line.strip()
+        if word:
+            out.write(json.dumps(translator.lookup(word), ensure_ascii=False) + '\n')
+
+#Query server handler: GET /translate?word=... (word may repeat), POST /translate with
+#one word per line, GET /stats
+class Translate_Handler(BaseHTTPRequestHandler):
+    translator = None  #Set by serve()
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == '/stats':
+            self.reply(200, self.translator.stats())
+        elif url.path == '/translate':
+            words = parse_qs(url.query).get('word', [])
+            if not words:
+                self.reply(400, {"error": "Missing word parameter."})
+            else:
+                results = [self.translator.lookup(word) for word in words]
+                self.reply(200, results[0] if len(results) == 1 else results)
+        else:
+            self.reply(404, {"error": "Not found."})
+
+    def do_POST(self):
+        if urlparse(self.path).path != '/translate':
+            self.reply(404, {"error": "Not found."})
+            return
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0))).decode('utf-8')
+        self.reply(200, [self.translator.lookup(word) for word in body.splitlines() if word.strip()])
+
+    #Send a json response
+    def reply(self, status, data):
+        body = json.dumps(data, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  #No line per request
+
+#Serve lookups on host:port until interrupted. Each request runs in its own thread.
+def serve(translator, host='127.0.0.1', port=8765):
+    handler = type('Handler', (Translate_Handler,), {'translator': translator})
+    server = ThreadingHTTPServer((host, port), handler)
+    print("Serving dictionary on http://%s:%d/translate?word=..." % (host, server.server_address[1]), file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Translate word lists or serve dictionary lookups.")
+    parser.add_argument('--data', default='data.json', help="json dictionary or dictionary file (default: data.json)")
+    parser.add_argument('-n', '--suggestions', type=int, default=3, help="suggestions for a word not found")
+    parser.add_argument('--cache', type=int, default=10000, help="words kept in the lookup cache")
+    commands = parser.add_subparsers(dest='command', required=True)
+    batch = commands.add_parser('batch', help="translate words (one per line) from files or stdin to json lines")
+    batch.add_argument('files', nargs='*', help="word list files (default: stdin)")
+    server = commands.add_parser('serve', help="serve lookups over http on localhost")
+    server.add_argument('--host', default='127.0.0.1')
+    server.add_argument('--port', type=int, default=8765)
+    args = parser.parse_args()
+
+    translator = Translator(args.data, args.suggestions, args.cache)
+    translator.warm_up()
+    if args.command == 'batch':
+        if args.files:
+            for path in args.files:
+                with open(path, encoding='utf-8') as f:
+                    translate_batch(translator, f, sys.stdout)
+        else:
+            translate_batch(translator, sys.stdin, sys.stdout)
+        print(json.dumps(translator.stats()), file=sys.stderr)
+    else:
+        serve(translator, args.host, args.port)
+
+if __name__ == '__main__':
+    main()
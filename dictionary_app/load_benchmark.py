@@ -0,0 +1,70 @@
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import subprocess
+import tempfile
+from dictionary import build_dictionary_file
+
+#Run in a new process: open the dictionary at path, look up words and report times and memory
+CHILD = r'''
+import sys, json, time, resource
+start = time.perf_counter()
+from dictionary import load_dictionary
+dic = load_dictionary(sys.argv[1])
+opened = time.perf_counter()
+words = json.loads(sys.argv[2])
+first = dic[words[0]]
+first_lookup = time.perf_counter()
+for word in words:
+    dic[word]
+done = time.perf_counter()
+try:  #Peak memory of this program, ru_maxrss can include the parent it was forked from
+    with open("/proc/self/status") as f:
+        rss_mb = [int(line.split()[1]) / 2 ** 10 for line in f if line.startswith("VmHWM:")][0]
+except OSError:
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    rss_mb = rss / 2 ** 20 if sys.platform == "darwin" else rss / 2 ** 10
+print(json.dumps({"open_s": round(opened - start, 4),
+                  "first_definition_s": round(first_lookup - start, 4),
+                  "lookup_us": round((done - first_lookup) * 1e6 / len(words), 2),
+                  "max_rss_mb": round(rss_mb, 1)}))
+'''
+
+#Startup time and resident memory of the json dictionary and the dictionary file, each
+#measured in a fresh process (best of `repeat` runs)
+def run_benchmark(path, lookups=1000, repeat=3, seed=0):
+    with open(path, 'r') as f:
+        keys = list(json.loads(f.read()))
+    words = random.Random(seed).sample(keys, min(lookups, len(keys)))
+    folder = os.path.dirname(os.path.abspath(__file__))
+    results = {"words": len(keys), "json_mb": round(os.path.getsize(path) / 2 ** 20, 1)}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        dict_path = os.path.join(tmp, 'data.dict')
+        start = time.perf_counter()
+        build_dictionary_file(path, dict_path)
+        results["build_s"] = round(time.perf_counter() - start, 2)
+        results["dict_mb"] = round(os.path.getsize(dict_path) / 2 ** 20, 1)
+        for name, source in (("json", path), ("dictionary_file", dict_path)):
+            runs = [json.loads(subprocess.run([sys.executable, '-c', CHILD, source, json.dumps(words)], cwd=folder,
+                                              capture_output=True, text=True, check=True).stdout)
+                    for _ in range(repeat)]
+            results[name] = {key: min(run[key] for run in runs) for key in runs[0]}
+    baseline = json.loads(subprocess.run([sys.executable, '-c', CHILD.replace("dic = load_dictionary(sys.argv[1])", "dic = {w: 0 for w in json.loads(sys.argv[2])}"),
+                                          path, json.dumps(words)], cwd=folder, capture_output=True, text=True, check=True).stdout)
+    results["python_baseline_rss_mb"] = baseline["max_rss_mb"]
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare startup time and memory of data.json with a dictionary file.")
+    parser.add_argument("data", nargs="?", default="data.json", help="dictionary json file (default: data.json)")
+    parser.add_argument("-n", "--lookups", type=int, default=1000, help="words looked up after opening")
+    parser.add_argument("--repeat", type=int, default=3, help="runs of each, best is reported")
+    args = parser.parse_args()
+    print(json.dumps(run_benchmark(args.data, args.lookups, args.repeat), indent=2))
+
+if __name__ == "__main__":
+    main()
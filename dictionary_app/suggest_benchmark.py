@@ -0,0 +1,103 @@
+import json
+import time
+import random
+import argparse
+from difflib import get_close_matches
+from dictionary import Suggestion_Index
+
+LETTERS = "abcdefghijklmnopqrstuvwxyz"
+
+#Misspell word with `edits` random inserts, deletes, replaces or swaps
+def misspell(word, edits, rng):
+    for _ in range(edits):
+        i = rng.randrange(len(word))
+        kind = rng.choice(["insert", "delete", "replace", "swap"])
+        if kind == "insert":
+            word = word[:i] + rng.choice(LETTERS) + word[i:]
+        elif kind == "delete" and len(word) > 1:
+            word = word[:i] + word[i + 1:]
+        elif kind == "swap" and i + 1 < len(word):
+            word = word[:i] + word[i + 1] + word[i] + word[i + 2:]
+        else:
+            word = word[:i] + rng.choice(LETTERS) + word[i + 1:]
+    return word
+
+#Misspelled dictionary words (excluding words still found in the dictionary) with the intended word
+def make_typos(keys, count, seed=0):
+    rng = random.Random(seed)
+    words = [key for key in keys if len(key) >= 4 and key.isalpha()]
+    typos = []
+    while len(typos) < count:
+        word = rng.choice(words)
+        typo = misspell(word, rng.choice([1, 1, 2]), rng)
+        if typo not in keys and typo.lower() not in keys:
+            typos.append((typo, word))
+    return typos
+
+#Short junk words (2 or 3 random letters, like "zz" or "xq") that are not dictionary keys
+def make_junk(keys, count, seed=0):
+    rng = random.Random(seed)
+    junk = set()
+    while len(junk) < count:
+        word = ''.join(rng.choice(LETTERS) for _ in range(rng.choice([2, 3])))
+        if word not in keys and word.lower() not in keys:
+            junk.add(word)
+    return sorted(junk)
+
+#Share of junk words a suggest function gives no suggestion for (nothing close to suggest)
+def empty_rate(suggest, junk):
+    return round(sum(not suggest(word) for word in junk) / len(junk), 3)
+
+#Latency and hit rate of a suggest function: top1 is the intended word suggested
+#first, top3 among the first three
+def measure(suggest, typos):
+    times = []
+    top1 = top3 = 0
+    for typo, word in typos:
+        start = time.perf_counter()
+        suggestions = suggest(typo)
+        times.append((time.perf_counter() - start) * 1000)
+        top1 += suggestions[:1] == [word]
+        top3 += word in suggestions[:3]
+    times.sort()
+    return {"typos": len(typos),
+            "top1_hit_rate": round(top1 / len(typos), 3),
+            "top3_hit_rate": round(top3 / len(typos), 3),
+            "mean_ms": round(sum(times) / len(times), 3),
+            "p95_ms": round(times[int(0.95 * (len(times) - 1))], 3)}
+
+#Compare the suggestion index with get_close_matches on misspellings of dictionary words
+def run_benchmark(path, typos=200, seed=0):
+    with open(path, 'r') as f:
+        dic = json.loads(f.read())
+    junk = make_junk(dic, typos, seed)
+    typos = make_typos(dic, typos, seed)
+
+    start = time.perf_counter()
+    index = Suggestion_Index(dic)
+    index.build()
+    build = time.perf_counter() - start
+
+    results = {"keys": len(dic),
+               "index_build_s": round(build, 2),
+               "index_deletions": sum(len(deletes) for deletes in index.deletes),
+               "suggestion_index": measure(index.suggest, typos),
+               "suggestion_index_first_only": measure(lambda word: index.suggest(word, 1), typos),  #As translate asks
+               "get_close_matches": measure(lambda word: get_close_matches(word, dic.keys()), typos)}
+    same = sum(index.suggest(typo)[:1] == get_close_matches(typo, dic.keys())[:1] for typo, word in typos)
+    results["same_first_suggestion"] = round(same / len(typos), 3)
+    results["junk_words"] = len(junk)
+    results["junk_no_suggestion"] = {"suggestion_index": empty_rate(index.suggest, junk),
+                                     "get_close_matches": empty_rate(lambda word: get_close_matches(word, dic.keys()), junk)}
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark dictionary suggestions against get_close_matches.")
+    parser.add_argument("data", nargs="?", default="data.json", help="dictionary json file (default: data.json)")
+    parser.add_argument("-n", "--typos", type=int, default=200, help="misspelled words to look up")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    print(json.dumps(run_benchmark(args.data, args.typos, args.seed), indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+import os
+import csv
+import glob
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+
+VIDEO_EXTENSIONS = ('.mp4', '.mov', '.avi', '.mkv', '.m4v', '.mpg', '.mpeg', '.wmv')
+
+class Batch_Motion():
+    """
+    This class runs headless motion detection on many video sources at once. Sources
+    can be folders (every video file inside), glob patterns, video files, stream URLs
+    or webcam indexes. Sources are spread across a pool of worker processes sized to
+    the CPU cores. The motion log of a video file is written next to it as
+    <name>_motion_times.csv; logs of streams and webcams are written to the output
+    folder. A summary csv with the status and throughput of every source is written
+    when all sources are done. A source that fails to open or decode is reported in
+    the summary and does not stop the other sources. A worker process that dies (e.g.
+    a decoder crash) breaks the pool and every source not done yet; those sources are
+    run again each in its own worker process, so only the one that crashes again is
+    reported failed. Optional zones json file (see zones.py) limits detection to the
+    zones for every source.
+    """
+    def __init__(self, sources, out_folder='.', workers=None, summary=None,
+                 max_frames=None, stall_timeout=30, zones=None):
+        self.sources = expand_sources(sources)
+        self.out_folder = out_folder           # Folder for logs of streams/webcams and the summary
+        self.workers = workers or os.cpu_count() or 1
+        self.summary = summary or os.path.join(out_folder, 'motion_summary.csv')
+        self.max_frames = max_frames           # Frame limit per source (needed for live streams)
+        self.stall_timeout = stall_timeout     # Seconds without a decoded frame before a source is abandoned
+        self.zones = zones                     # Zones json file path (None = whole frame)
+        self.results = []
+
+        os.makedirs(self.out_folder, exist_ok=True)
+        start = time.perf_counter()
+        with ProcessPoolExecutor(max_workers=self.workers, initializer=init_worker) as pool:
+            jobs = {pool.submit(detect_source, source, self.log_path(source),
+                                self.max_frames, self.stall_timeout, self.zones): source
+                    for source in self.sources}
+            unfinished = []                    # Sources of the pool broken by a dying worker
+            for job in as_completed(jobs):
+                try:
+                    self.report(job.result())
+                except BrokenProcessPool:
+                    unfinished.append(jobs[job])
+                except Exception as e:
+                    self.report(failed_result(jobs[job], self.log_path(jobs[job]), e))
+        if unfinished:
+            with ThreadPoolExecutor(max_workers=self.workers) as threads:
+                for result in threads.map(self.detect_alone, sorted(unfinished, key=str)):
+                    self.report(result)
+        self.elapsed = time.perf_counter() - start
+
+        self.write_summary()
+        frames = sum(r['frames'] for r in self.results)
+        failed = sum(r['status'] != 'ok' for r in self.results)
+        print("%d sources (%d failed), %d frames in %.2f s (%.1f fps overall) with %d workers"
+              % (len(self.results), failed, frames, self.elapsed,
+                 frames / self.elapsed if self.elapsed > 0 else 0.0, self.workers))
+
+    # Run one source in a worker process of its own, so a crash fails that source only
+    def detect_alone(self, source):
+        log = self.log_path(source)
+        try:
+            with ProcessPoolExecutor(max_workers=1, initializer=init_worker) as pool:
+                return pool.submit(detect_source, source, log, self.max_frames, self.stall_timeout,
+                                   self.zones).result()
+        except Exception as e:                 # Worker process died again (e.g. decoder crash)
+            return failed_result(source, log, e)
+
+    # Keep and print the result of a source
+    def report(self, result):
+        self.results.append(result)
+        print("[%s] %s: %d frames, %.1f fps, %d motions%s"
+              % (result['status'], result['source'], result['frames'], result['fps'],
+                 result['motions'], ' (' + result['error'] + ')' if result['error'] else ''))
+
+    # Motion log path of a source: next to video files, in the output folder otherwise
+    def log_path(self, source):
+        if isinstance(source, str) and os.path.isfile(source):
+            return os.path.splitext(source)[0] + '_motion_times.csv'
+        name = ''.join(c if c.isalnum() else '_' for c in str(source)).strip('_')
+        return os.path.join(self.out_folder, 'source_' + name + '_motion_times.csv')
+
+    # Write status and throughput of all sources to the summary csv
+    def write_summary(self):
+        fields = ['source', 'status', 'frames', 'seconds', 'fps', 'motions', 'log', 'error']
+        with open(self.summary, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=fields)
+            writer.writeheader()
+            for result in sorted(self.results, key=lambda r: str(r['source'])):
+                writer.writerow(result)
+
+# Expand folders and glob patterns into a sorted list of video sources.
+# Stream URLs are kept as is and digit strings are treated as webcam indexes.
+def expand_sources(sources):
+    if isinstance(sources, str):
+        sources = [sources]
+    expanded = []
+    for source in sources:
+        if isinstance(source, int):
+            expanded.append(source)
+        elif source.isdigit():
+            expanded.append(int(source))
+        elif os.path.isdir(source):
+            expanded.extend(sorted(os.path.join(source, name) for name in os.listdir(source)
+                                   if name.lower().endswith(VIDEO_EXTENSIONS)))
+        elif glob.has_magic(source):
+            expanded.extend(sorted(glob.glob(source)))
+        else:
+            expanded.append(source)
+    return list(dict.fromkeys(expanded))   # Remove duplicates, keep order
+
+# Worker process setup: one OpenCV thread per process since the pool already uses every core
+def init_worker():
+    import cv2
+    cv2.setNumThreads(1)
+
+# Run headless motion detection on one source (runs in a worker process)
+def detect_source(source, log, max_frames=None, stall_timeout=None, zones=None):
+    from motion_pipeline import Motion_Pipeline
+    from zones import load_zones
+    try:
+        pipeline = Motion_Pipeline(source, log, max_frames=max_frames, stall_timeout=stall_timeout,
+                                   zones=load_zones(zones) if zones else None)
+    except Exception as e:
+        return failed_result(source, log, e)
+    return {'source': source, 'status': 'ok', 'frames': pipeline.frame_count,
+            'seconds': round(pipeline.elapsed, 3), 'fps': round(pipeline.fps, 1),
+            'motions': count_motions(log), 'log': log, 'error': ''}
+
+# Result entry of a source that could not be processed
+def failed_result(source, log, error):
+    return {'source': source, 'status': 'error', 'frames': 0, 'seconds': 0.0, 'fps': 0.0,
+            'motions': count_motions(log), 'log': log, 'error': '{}: {}'.format(type(error).__name__, error)}
+
+# Number of motions recorded in a motion log
+def count_motions(log):
+    if not os.path.isfile(log):
+        return 0
+    with open(log) as f:
+        return max(sum(1 for line in f if line.strip()) - 1, 0)
+
+def main():
+    parser = argparse.ArgumentParser(description="Detect motion in many videos, streams or webcams in parallel.")
+    parser.add_argument('sources', nargs='+', help="video folders, glob patterns, files, stream URLs or webcam indexes")
+    parser.add_argument('-o', '--out', default='.', help="folder for stream/webcam logs and the summary")
+    parser.add_argument('-w', '--workers', type=int, default=None, help="worker processes (default: CPU cores)")
+    parser.add_argument('-s', '--summary', default=None, help="summary csv path (default: OUT/motion_summary.csv)")
+    parser.add_argument('--max-frames', type=int, default=None, help="frame limit per source")
+    parser.add_argument('--stall-timeout', type=float, default=30, help="seconds without a frame before giving up")
+    parser.add_argument('-z', '--zones', default=None, help="zones json file (default: whole frame)")
+    args = parser.parse_args()
+    Batch_Motion(args.sources, args.out, args.workers, args.summary, args.max_frames, args.stall_timeout,
+                 args.zones)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,295 @@
+import os
+import cv2
+import sys
+import time
+import json
+import argparse
+import resource
+import tempfile
+import tracemalloc
+import numpy as np
+import pandas as pd
+from datetime import datetime, timedelta
+from motion import Motion_Detection
+from fast_scan import Fast_Scan
+
+START_TIME = datetime(2000, 1, 1)         # Start time given to detectors so log times are video times
+RESOLUTIONS = [(640, 360), (1280, 720), (1920, 1080)]
+LENGTHS = [300, 1200]                     # Frames per synthetic video
+SPARSE_CLIPS = [(4500, (30, 60))]         # Fast scan: (frames, seconds between motions) of mostly empty videos
+STAGES = [('resize_blur', 'resize_and_blur'), ('background', 'update_bg'), ('diff', 'remove_bg'),
+          ('threshold_dilate', 'threshold_mask'), ('contours', 'find_contour'), ('nms', 'draw_detections')]
+
+class Synthetic_Video():
+    """
+    This class generates a deterministic video of bright blobs moving over a noisy
+    background. Blobs only move during known motion intervals, which are the ground
+    truth the detected motions are checked against. Intervals are separated by gaps
+    long enough for the averaged background to forget the previous blob (gap, in
+    seconds). The same seed always gives the same video.
+    """
+    def __init__(self, width=640, height=360, frames=300, fps=25, seed=0, noise=3, gap=(5, 7)):
+        self.width = width
+        self.height = height
+        self.frames = frames
+        self.fps = fps
+        self.noise = noise                       # Standard deviation of per-frame pixel noise
+        self.rng = np.random.default_rng(seed)
+        self.background = self.rng.integers(60, 120, (height, width, 3), dtype=np.uint8)
+        # Frames cycle through a few precomputed noise patterns, much faster than new noise per frame
+        self.noise_bank = [np.clip(self.background + self.rng.normal(0, noise, self.background.shape), 0, 255)
+                           .astype(np.uint8) for _ in range(8)]
+
+        # Motion intervals [start, end) in frames, each with one blob crossing the frame
+        self.blobs = []
+        start = 2 * fps                          # Let the background settle first
+        while start + fps < frames:
+            end = min(start + int(self.rng.integers(fps, 3 * fps)), frames)
+            self.blobs.append({'start': start, 'end': end,
+                               'radius': height // 10,
+                               'y': int(self.rng.integers(height // 4, 3 * height // 4)),
+                               'color': tuple(int(c) for c in self.rng.integers(200, 256, 3))})
+            start = end + int(self.rng.integers(gap[0] * fps, gap[1] * fps))
+
+    # Frame i of the video
+    def frame(self, i):
+        frame = self.noise_bank[i % len(self.noise_bank)].copy()
+        for blob in self.blobs:
+            if blob['start'] <= i < blob['end']:
+                progress = (i - blob['start']) / max(blob['end'] - blob['start'] - 1, 1)
+                x = int(blob['radius'] + progress * (self.width - 2 * blob['radius']))
+                cv2.circle(frame, (x, blob['y']), blob['radius'], blob['color'], -1)
+        return frame
+
+    # Ground truth motion intervals in seconds
+    def intervals(self):
+        return [(blob['start'] / self.fps, blob['end'] / self.fps) for blob in self.blobs]
+
+    # Write video to file (motion jpeg, so every frame decodes on its own)
+    def write(self, path):
+        writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'MJPG'), self.fps, (self.width, self.height))
+        for i in range(self.frames):
+            writer.write(self.frame(i))
+        writer.release()
+        return path
+
+class Stage_Timer():
+    """
+    This class times the processing stages of a Motion_Detection by wrapping its stage
+    methods. Times are accumulated per stage in seconds.
+    """
+    def __init__(self, detector, stages=STAGES):
+        self.times = {name: 0.0 for name, method in stages}
+        for name, method in stages:
+            setattr(detector, method, self.timed(name, getattr(detector, method)))
+
+    # Wrap a method to add its run time to a stage
+    def timed(self, name, method):
+        def run(*args, **kwargs):
+            start = time.perf_counter()
+            result = method(*args, **kwargs)
+            self.times[name] += time.perf_counter() - start
+            return result
+        return run
+
+# Create a Motion_Detection that is fed frames directly instead of from its own loop
+def make_detector(path, log, reuse_buffers=False, zones=None):
+    detector = Motion_Detection.__new__(Motion_Detection)
+    detector.setup(path, log, reuse_buffers, zones, START_TIME)
+    return detector
+
+# Run headless detection on a video file and time every stage
+def run_detection(path, log, reuse_buffers=False):
+    detector = make_detector(path, log, reuse_buffers)
+    timer = Stage_Timer(detector)
+    decode = 0.0
+    frames = 0
+    tracemalloc.start()
+    start = time.perf_counter()
+    detector.open_source()
+    while True:
+        t = time.perf_counter()
+        detector.frame = detector.read_frame()
+        decode += time.perf_counter() - t
+        if detector.frame is None:
+            detector.end_motion()
+            break
+        detector.frame_time = detector.frame_timestamp()
+        detector.process_frame()
+        frames += 1
+    detector.close_source()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    stages = dict(decode=decode, **timer.times)
+    return {'frames': frames,
+            'seconds': round(elapsed, 3),
+            'fps': round(frames / elapsed, 1) if elapsed > 0 else 0.0,
+            'stage_ms_per_frame': {name: round(t * 1000 / max(frames, 1), 3) for name, t in stages.items()},
+            'peak_traced_mb': round(peak / 2 ** 20, 1)}
+
+# Read detected motion intervals in seconds from the start of the video
+def read_intervals(log):
+    motion = pd.read_csv(log)
+    start = (pd.to_datetime(motion['start'], format="ISO8601") - START_TIME).dt.total_seconds()
+    end = (pd.to_datetime(motion['end'], format="ISO8601") - START_TIME).dt.total_seconds()
+    return list(zip(start, end))
+
+# Check detected intervals against the ground truth. A true interval is found when a
+# detection overlaps it, a detection is false when it overlaps no true interval.
+# Detections may end up to `lag` seconds late while the averaged background catches up.
+def check_intervals(truth, detected, lag=3.0):
+    def overlap(s, e, s_true, e_true):
+        return s < e_true + lag and e > s_true
+
+    found = [any(overlap(s, e, s_true, e_true) for s, e in detected) for s_true, e_true in truth]
+    false = [not any(overlap(s, e, s_true, e_true) for s_true, e_true in truth) for s, e in detected]
+    start_errors = [abs(s - s_true) for s_true, e_true in truth for s, e in detected
+                    if overlap(s, e, s_true, e_true)]
+    return {'true_intervals': len(truth),
+            'detected_intervals': len(detected),
+            'found': sum(found),
+            'false': sum(false),
+            'max_start_error_s': round(max(start_errors), 3) if start_errors else None,
+            'passed': all(found) and not any(false)}
+
+# Agreement of detected intervals with reference intervals (e.g. of a full pass):
+# intervals matched one to one by overlap, largest start and end differences of the
+# matches and the overlap of the total motion time (intersection over union)
+def interval_agreement(reference, detected):
+    matched = [(r, d) for r in reference for d in detected if d[0] < r[1] and d[1] > r[0]]
+    def total(intervals):
+        return sum(e - s for s, e in intervals)
+    intersection = total([(max(r[0], d[0]), min(r[1], d[1])) for r, d in matched])
+    union = total(reference) + total(detected) - intersection
+    return {'reference_intervals': len(reference),
+            'detected_intervals': len(detected),
+            'matched': len(matched),
+            'max_start_diff_s': round(max((abs(r[0] - d[0]) for r, d in matched), default=0), 3),
+            'max_end_diff_s': round(max((abs(r[1] - d[1]) for r, d in matched), default=0), 3),
+            'time_iou': round(intersection / union, 4) if union > 0 else 1.0}
+
+# Compare the fast scan with a full pass over synthetic videos: the benchmark clips of
+# every resolution and length, and mostly empty clips (SPARSE_CLIPS)
+def compare_fast_scan(resolutions=RESOLUTIONS, lengths=LENGTHS, sparse_clips=SPARSE_CLIPS, sample_fps=2.0, seed=0):
+    clips = [(frames, (5, 7)) for frames in lengths] + list(sparse_clips)
+    results = []
+    with tempfile.TemporaryDirectory() as folder:
+        for width, height in resolutions:
+            for frames, gap in clips:
+                video = Synthetic_Video(width, height, frames, seed=seed, gap=gap)
+                path = video.write(os.path.join(folder, 'synthetic_%dx%d_%d.avi' % (width, height, frames)))
+                full_log = os.path.join(folder, 'full_motion_times.csv')
+                full = run_detection(path, full_log, reuse_buffers=True)
+                scan_log = os.path.join(folder, 'scan_motion_times.csv')
+                scan = Fast_Scan(path, scan_log, sample_fps, reuse_buffers=True, start_time=START_TIME)
+                truth, full_intervals, scan_intervals = video.intervals(), read_intervals(full_log), read_intervals(scan_log)
+                result = {'video': os.path.basename(path), 'width': width, 'height': height, 'frames': frames,
+                          'motion_fraction': round(sum(e - s for s, e in truth) * video.fps / frames, 3),
+                          'full_s': full['seconds'],
+                          'scan_s': round(scan.elapsed, 3),
+                          'coarse_s': round(scan.coarse_seconds, 3),
+                          'speedup': round(full['seconds'] / scan.elapsed, 1) if scan.elapsed > 0 else None,
+                          'raw_scan': scan.raw_scan,
+                          'coarse_samples': scan.samples,
+                          'coarse_flag_rate': round(len(scan.flagged) / scan.samples, 3) if scan.samples else None,
+                          'frames_processed': scan.frames_processed + scan.frames_warmup,
+                          'seeks': scan.seeks,
+                          'agreement_with_full': interval_agreement(full_intervals, scan_intervals),
+                          'full_intervals': check_intervals(truth, full_intervals),
+                          'scan_intervals': check_intervals(truth, scan_intervals)}
+                results.append(result)
+                print("%s: full %.2f s, fast scan %.2f s (%.1fx), %.1f%% of samples flagged, time IoU %.3f"
+                      % (result['video'], result['full_s'], result['scan_s'], result['speedup'],
+                         100 * result['coarse_flag_rate'], result['agreement_with_full']['time_iou']), file=sys.stderr)
+    return {'opencv': cv2.__version__, 'sample_fps': sample_fps, 'results': results}
+
+# Benchmark detection over synthetic videos of every resolution and length
+def run_suite(resolutions=RESOLUTIONS, lengths=LENGTHS, reuse_buffers=(False, True), seed=0):
+    results = []
+    with tempfile.TemporaryDirectory() as folder:
+        for width, height in resolutions:
+            for frames in lengths:
+                video = Synthetic_Video(width, height, frames, seed=seed)
+                path = video.write(os.path.join(folder, 'synthetic_%dx%d_%d.avi' % (width, height, frames)))
+                for reuse in reuse_buffers:
+                    log = os.path.join(folder, 'motion_times.csv')
+                    result = run_detection(path, log, reuse)
+                    result.update({'video': os.path.basename(path), 'width': width, 'height': height,
+                                   'reuse_buffers': reuse,
+                                   'intervals': check_intervals(video.intervals(), read_intervals(log))})
+                    results.append(result)
+                    print("%s reuse_buffers=%s: %.1f fps, intervals %s" % (result['video'], reuse, result['fps'],
+                          'ok' if result['intervals']['passed'] else 'FAILED'), file=sys.stderr)
+    return {'opencv': cv2.__version__, 'max_rss_mb': round(max_rss_mb(), 1), 'results': results}
+
+# Peak resident memory of this process in MB
+def max_rss_mb():
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / 2 ** 20 if sys.platform == 'darwin' else rss / 2 ** 10
+
+# Per-frame latency and memory allocated by process_frame in default and reuse_buffers mode
+def compare_hot_path(frames=300, width=1280, height=720, warmup=10):
+    video = Synthetic_Video(width, height, frames)
+    results = {}
+    for mode, reuse in (('default', False), ('reuse_buffers', True)):
+        with tempfile.TemporaryDirectory() as folder:
+            detector = make_detector(None, os.path.join(folder, 'motion_times.csv'), reuse)
+            latency = []
+            allocated = []
+            tracemalloc.start()
+            for i in range(frames):
+                detector.frame = video.frame(i)
+                detector.frame_time = START_TIME + timedelta(seconds=i / video.fps)
+                before = tracemalloc.get_traced_memory()[0]
+                tracemalloc.reset_peak()
+                start = time.perf_counter()
+                detector.process_frame()
+                end = time.perf_counter()
+                if i == warmup:
+                    warm_memory = tracemalloc.get_traced_memory()[0]
+                if i >= warmup:
+                    latency.append(end - start)
+                    allocated.append(tracemalloc.get_traced_memory()[1] - before)
+                    growth = tracemalloc.get_traced_memory()[0] - warm_memory
+            tracemalloc.stop()
+
+        latency = np.array(latency) * 1000
+        results[mode] = {'frames': len(latency),
+                         'latency_ms_mean': round(float(latency.mean()), 3),
+                         'latency_ms_p95': round(float(np.percentile(latency, 95)), 3),
+                         'allocated_kb_per_frame': round(float(np.mean(allocated)) / 1024, 1),
+                         'memory_growth_kb': round(growth / 1024, 1)}
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark motion detection on synthetic videos.")
+    parser.add_argument('--hot-path', action='store_true', help="compare per-frame latency/allocation of the hot path")
+    parser.add_argument('--fast-scan', action='store_true', help="compare the fast scan of video files with a full pass")
+    parser.add_argument('--resolutions', nargs='+', default=None, help="e.g. 640x360 1280x720")
+    parser.add_argument('--lengths', nargs='+', type=int, default=LENGTHS, help="frames per video")
+    parser.add_argument('--frames', type=int, default=300, help="frames for --hot-path")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('-o', '--out', default=None, help="write json results to file")
+    args = parser.parse_args()
+
+    resolutions = RESOLUTIONS
+    if args.resolutions:
+        resolutions = [tuple(int(v) for v in r.split('x')) for r in args.resolutions]
+    if args.hot_path:
+        results = compare_hot_path(args.frames)
+    elif args.fast_scan:
+        results = compare_fast_scan(resolutions, args.lengths, seed=args.seed)
+    else:
+        results = run_suite(resolutions, args.lengths, seed=args.seed)
+
+    text = json.dumps(results, indent=2)
+    if args.out:
+        with open(args.out, 'w') as f:
+            f.write(text)
+    else:
+        print(text)
+
+if __name__ == '__main__':
+    main()
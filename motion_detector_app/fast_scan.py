@@ -0,0 +1,215 @@
+import cv2
+import time
+import argparse
+import numpy as np
+from datetime import timedelta
+from motion import Motion_Detection
+from zones import load_zones
+
+DETECTION_WIDTH = 500    # Frame width of the full detection, which MIN_DETECTION_AREA is measured at
+SEEK_FRAMES = 30        # Seek instead of grabbing over gaps longer than this (an OpenCV seek costs ~17 frame decodes)
+REDUCED_FLAGS = {2: cv2.IMREAD_REDUCED_GRAYSCALE_2, 4: cv2.IMREAD_REDUCED_GRAYSCALE_4,
+                 8: cv2.IMREAD_REDUCED_GRAYSCALE_8}
+
+class Fast_Scan(Motion_Detection):
+    """
+    This class finds the motions in a recorded video file without processing every
+    frame when most of the video has no motion. A coarse pass looks at sample_fps
+    frames per second only, shrunk to 1/8 size in gray, and flags the samples where
+    an area of pixels differs from an averaged background: coarse_area times
+    MIN_DETECTION_AREA, scaled to the coarse size, so single noisy pixels do not
+    flag a sample. In motion jpeg files the skipped frames are
+    never decoded (raw packets are read, and samples are decoded straight to the
+    small size); other files grab the skipped frames without converting them. A fine
+    pass then runs the full detection at every frame around the flagged samples only.
+    It starts warmup seconds early to build the background and keeps going while the
+    motion lasts, so motion start and end times are those of a full pass. Long gaps
+    between windows are skipped with a seek. No video is displayed. The motion log
+    is the same as Motion_Detection. See Motion_Detection for reuse_buffers, zones
+    and start_time.
+    """
+    def __init__(self, path, log, sample_fps=2.0, warmup=1.0, coarse_threshold=6, coarse_area=0.5,
+                 reuse_buffers=False, zones=None, start_time=None):
+        self.setup(path, log, reuse_buffers, zones, start_time)
+        self.sample_fps = sample_fps               # Frames per second looked at by the coarse pass
+        self.coarse_threshold = coarse_threshold   # Gray level change of a changed coarse pixel
+        self.coarse_area = coarse_area             # Fraction of the detection area changed that flags a sample
+        self.coarse_pixels = 0                     # Changed coarse pixels that flag a sample
+        self.samples = 0                           # Frames looked at by the coarse pass
+        self.flagged = []                          # Frame indexes of the samples with motion
+        self.windows = []                          # [first, last] frame windows of the fine pass
+        self.frames_processed = 0                  # Frames run through full detection
+        self.frames_warmup = 0                     # Frames only added to the background
+        self.seeks = 0
+        self.raw_scan = False                      # Coarse pass read raw jpeg packets
+
+        start = time.perf_counter()
+        self.open_source()
+        self.frame_total = int(self.vs.get(cv2.CAP_PROP_FRAME_COUNT))
+        self.step = max(int(round(self.video_fps / sample_fps)), 1)
+        self.warmup_frames = int(round(warmup * self.video_fps))
+        try:
+            self.coarse_pass()
+            self.coarse_seconds = time.perf_counter() - start
+            self.fine_windows()
+            self.fine_pass()
+        finally:
+            self.close_source()
+        self.elapsed = time.perf_counter() - start
+        self.fine_seconds = self.elapsed - self.coarse_seconds
+
+    # Coarse pass: flag the samples that differ from a background averaged over the
+    # samples with the same memory in seconds as the full detection background
+    def coarse_pass(self):
+        width = self.vs.get(cv2.CAP_PROP_FRAME_WIDTH)
+        reduce = 8 if width >= 640 else 4 if width >= 320 else 2
+        scale = -(-width // reduce) / DETECTION_WIDTH
+        self.coarse_pixels = max(int(round(self.coarse_area * self.MIN_DETECTION_AREA * scale ** 2)), 1)
+        samples = self.raw_samples(reduce)
+        if samples is None:
+            samples = self.decoded_samples(reduce)
+        weight = 1 - (1 - self.FRAME_WEIGHT) ** self.step
+        background = None
+        for index, gray in samples:
+            self.samples += 1
+            if background is None:
+                background = gray.astype(np.float32)
+                continue
+            cv2.accumulateWeighted(gray, background, weight)
+            delta = cv2.absdiff(gray, cv2.convertScaleAbs(background))
+            if np.count_nonzero(delta >= self.coarse_threshold) >= self.coarse_pixels:
+                self.flagged.append(index)
+        if not self.raw_scan:
+            self.open_source()                     # Reopened at the first frame for the fine pass
+
+    # Coarse frames from the raw packets of a motion jpeg file, decoded only for the
+    # samples and straight to 1/reduce size. None if the packets are not jpeg images.
+    def raw_samples(self, reduce):
+        raw = cv2.VideoCapture(self.path, cv2.CAP_FFMPEG)
+        if not raw.isOpened() or not raw.set(cv2.CAP_PROP_FORMAT, -1):
+            raw.release()
+            return None
+        ok, packet = raw.read()
+        if not ok or packet is None or packet.size < 2 or packet[0, 0] != 0xFF or packet[0, 1] != 0xD8:
+            raw.release()                          # Not a jpeg start of image marker
+            return None
+        self.raw_scan = True
+
+        def samples(packet):
+            index = 0
+            try:
+                while packet is not None:
+                    if index % self.step == 0:
+                        gray = cv2.imdecode(packet, REDUCED_FLAGS[reduce])
+                        if gray is not None:
+                            yield index, gray
+                    index += 1
+                    ok, packet = raw.read()
+                    if not ok:
+                        packet = None
+            finally:
+                raw.release()
+        return samples(packet)
+
+    # Coarse frames of other files: samples read and shrunk, skipped frames grabbed
+    # (or seeked over when samples are more than SEEK_FRAMES apart). The video is released
+    # when the samples end or are abandoned.
+    def decoded_samples(self, reduce):
+        seek = self.step > SEEK_FRAMES
+        index = 0
+        try:
+            while True:
+                if index % self.step == 0:
+                    ok, frame = self.vs.read()
+                    if not ok:
+                        break
+                    size = (-(-frame.shape[1] // reduce), -(-frame.shape[0] // reduce))
+                    small = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+                    yield index, cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+                    index += 1
+                    if seek and self.vs.set(cv2.CAP_PROP_POS_FRAMES, index + self.step - 1):
+                        index += self.step - 1
+                        self.seeks += 1
+                elif self.vs.grab():
+                    index += 1
+                else:
+                    break
+        finally:
+            self.vs.release()
+
+    # Frame windows of the fine pass: from two samples before every flagged sample (the
+    # motion began after the sample before, and the full detection is more sensitive)
+    # to one sample after it. Windows closer than the warm-up are merged.
+    def fine_windows(self):
+        for index in self.flagged:
+            first = max(index - 2 * self.step, 0)
+            last = index + self.step
+            if self.windows and first - self.warmup_frames <= self.windows[-1][1] + 1:
+                self.windows[-1][1] = max(self.windows[-1][1], last)
+            else:
+                self.windows.append([first, last])
+
+    # Fine pass: full detection at every frame of the windows, after a warm-up of the
+    # background, continued past the window while motion lasts
+    def fine_pass(self):
+        self.position = 0                          # Index of the next frame read
+        for first, last in self.windows:
+            if first > self.position:
+                self.skip_to(max(first - self.warmup_frames, self.position))
+                while self.position < first and self.read_indexed():
+                    self.resize_and_blur()
+                    self.update_bg()
+                    self.frames_warmup += 1
+            while self.position <= last or self.last_frame_motion:
+                if not self.read_indexed():
+                    break
+                self.process_frame()
+                self.frames_processed += 1
+        self.end_motion()
+
+    # Move to frame index target, grabbing the frames in between or seeking over long
+    # gaps. The background starts over after frames are skipped.
+    def skip_to(self, target):
+        if target <= self.position:
+            return
+        if target - self.position > SEEK_FRAMES and self.vs.set(cv2.CAP_PROP_POS_FRAMES, target):
+            self.position = target
+            self.seeks += 1
+        while self.position < target and self.vs.grab():
+            self.position += 1
+        self.avg_frame = None
+
+    # Read the frame at self.position and set its time. Returns False at end of video.
+    def read_indexed(self):
+        self.frame = self.read_frame()
+        msec = self.vs.get(cv2.CAP_PROP_POS_MSEC)
+        if msec <= 0 and self.position > 0:        # Video without timestamps
+            msec = self.position * 1000.0 / self.video_fps
+        self.frame_time = self.start_time + timedelta(milliseconds=msec)
+        if self.frame is None:
+            return False
+        self.position += 1
+        return True
+
+    # One line report of the scan
+    def summary(self):
+        return ("Scanned %d frames in %.2f s (coarse %.2f s%s, %d samples, %d flagged at %d pixels; fine %.2f s, "
+                "%d frames in %d windows, %d warm-up frames, %d seeks)"
+                % (self.frame_total, self.elapsed, self.coarse_seconds, ", raw jpeg" if self.raw_scan else "",
+                   self.samples, len(self.flagged), self.coarse_pixels, self.fine_seconds, self.frames_processed,
+                   len(self.windows), self.frames_warmup, self.seeks))
+
+def main():
+    parser = argparse.ArgumentParser(description="Find motions in a recorded video without processing every frame.")
+    parser.add_argument('video', help="video file")
+    parser.add_argument('log', help="motion log path (.csv, or .bin for the binary format)")
+    parser.add_argument('--sample-fps', type=float, default=2.0, help="frames per second of the coarse pass")
+    parser.add_argument('--warmup', type=float, default=1.0, help="seconds of background warm-up before a window")
+    parser.add_argument('-z', '--zones', default=None, help="zones json file (default: whole frame)")
+    args = parser.parse_args()
+    scan = Fast_Scan(args.video, args.log, args.sample_fps, args.warmup, reuse_buffers=True,
+                     zones=load_zones(args.zones) if args.zones else None)
+    print(scan.summary())
+
+if __name__ == '__main__':
+    main()
@@ -1,4 +1,7 @@
 from motion import Motion_Detection
+from motion_pipeline import Motion_Pipeline
+from fast_scan import Fast_Scan
+from zones import load_zones
 import os
 from plot_motion import plot_motion
 
@@ -7,7 +10,11 @@ def main():
     This app detections motions from a video and plots a motion graph over time.
     Video can be either (1) a save video in the folder venv/example_motion_detection
     or (2) from a webcam on the computer. Motions detected in the video are
-    highlight with green boxes in the video.
+    highlight with green boxes in the video. In headless mode (e.g. on a server
+    with no display) the video is processed by a threaded pipeline and the
+    highlighted video can optionally be recorded to a file instead of displayed.
+    Fast scan mode finds the motions of a saved video without displaying it, with
+    full detection only around the parts of the video that change.
     """
     folder_path = os.path.dirname(__file__)
     folder_path = os.path.join(folder_path, 'example\\')
@@ -17,8 +24,18 @@ def main():
 
     path = folder_path + videos[2]   # Video path.
     #path = None                       # Webcam
+    headless = False                   # Run without display windows
+    record = None                      # Headless: path to save highlighted video (None = no video)
+    zones_file = None                  # Motion zones file, e.g. folder_path + 'zones.json' (None = whole frame)
+    fast_scan = False                  # Saved video: coarse scan first, full detection only around motion
 
-    Motion_Detection(path, folder_path + motion)
+    zones = load_zones(zones_file) if zones_file else None
+    if fast_scan and path is not None:
+        print(Fast_Scan(path, folder_path + motion, zones=zones).summary())
+    elif headless:
+        Motion_Pipeline(path, folder_path + motion, record=record, zones=zones)
+    else:
+        Motion_Detection(path, folder_path + motion, zones=zones)
     plot_motion(panda_folder_path, motion)
 
 if __name__ == '__main__':
@@ -3,10 +3,11 @@ import time
 import numpy as np
 from imutils.video import VideoStream
 import imutils
-from datetime import datetime
+from datetime import datetime, timedelta
 import matplotlib.pyplot as plt
 from imutils.object_detection import non_max_suppression
 import os
+from motion_log import open_motion_log
 
 class Motion_Detection():
     """
@@ -15,9 +16,43 @@ class Motion_Detection():
     of the current frame with an averaged background and a video showing threshold
     area of motion. Video source can either be from either (1) a saved file in which the
     file path is provided as an argument or (2) the webcam in which the file path is
-    empty.
+    empty. With reuse_buffers, the resized, gray, blurred, delta and threshold frames
+    are allocated once and reused for every frame so memory stays flat while streaming.
+    With zones (see zones.py), only motion inside the zones is detected, each zone with
+    its own area threshold, and every motion logged carries the name of its zone.
+    Motion times are taken from the video frame timestamps (see frame_timestamp) with
+    millisecond precision and written when a motion ends. A log path ending in .bin
+    is written in the binary format of motion_log.py. The log is created once the
+    video source opens, so a source that cannot be opened leaves no log behind.
     """
-    def __init__(self, path, log):
+    def __init__(self, path, log, reuse_buffers=False, zones=None, start_time=None):
+        self.setup(path, log, reuse_buffers, zones, start_time)
+        self.open_source()
+
+        while True:
+            # Obtain and process one frame at a time
+            self.frame = self.read_frame()
+            self.frame_time = self.frame_timestamp()
+            if self.frame is None:                # Capture end of video time in case of motion detected in last frame
+                self.end_motion()
+                break
+            self.process_frame()
+
+            # Draw text and timestamp on frame
+            self.add_status_timestamps()
+
+            # Display videos
+            cv2.imshow("Security Feed", self.frame)
+            cv2.imshow("Frame Delta", self.frameDelta)
+            cv2.imshow("Mask", self.threshold)
+            if cv2.waitKey(1) & 0xFF == ord("q"):
+                self.end_motion()
+                break
+        self.close_source()
+        cv2.destroyAllWindows()
+
+    # Initialize detection state and motion log
+    def setup(self, path, log, reuse_buffers=False, zones=None, start_time=None):
         self.path = path                     # Video file path
         self.motion_log = log                # Motion log file path
         self.avg_frame = None                # Initialize average frame variable
@@ -25,84 +60,137 @@ class Motion_Detection():
         self.current_frame_motion = False    # Flag for motion in the current frame
         self.frameDelta = None               # Initialize frame delta frame variable
         self.threshold = None                # Initialize/rest frame threshold frame variable
+        self.reuse_buffers = reuse_buffers   # Reuse preallocated frame buffers
+        self.buffers_shape = None            # Input frame shape the buffers are allocated for
+        self.zones = zones or []             # Motion zones (empty = whole frame)
+        self.active_zones = []               # Zones with motion in the current frame
+        self.start_time = start_time         # Time of the first video frame (None = estimated from file)
+        self.frames_read = 0                 # Frames read from the video source
+        self.frame_time = None               # Time of the current frame
+        self.webcam_stream = True            # Webcam read by imutils' thread (latest frame at once) or blocking
 
         self.MIN_DETECTION_AREA = 200        # 50 for videos
         self.FRAME_WEIGHT = 0.05             # 0.05 works well for [1] and [0]
 
-        with open(self.motion_log, 'w') as f:
-            f.write('start,end')
+        self.events = None                   # Motion log, created when the source first opens
 
-        if self.path is None:
+    # Open video stream from file or webcam, and create the motion log the first time
+    def open_source(self):
+        if self.path is None and self.webcam_stream:
             self.vs = VideoStream(src=0).start()  # Obtain video from webcam
             time.sleep(2.0)                       # Give 2 seconds for camera to warm up
         else:
-            self.vs = cv2.VideoCapture(path)      # Obtain video from file
+            self.vs = cv2.VideoCapture(0 if self.path is None else self.path) # Obtain video from file (or webcam without its thread)
+            if not self.vs.isOpened():
+                raise IOError("Unable to open video source: {}".format(self.path))
+            self.video_fps = self.vs.get(cv2.CAP_PROP_FPS) or 30.0
+            if self.start_time is None:
+                self.start_time = self.estimate_start_time()
+        if self.events is None:
+            self.events = open_motion_log(self.motion_log, [zone.name for zone in self.zones] or None)
 
-        while True:
-            # Obtain and process one frame at a time
-            self.frame = self.vs.read()
+    # Estimate recording start of a video file as its modification time minus its duration
+    def estimate_start_time(self):
+        if not isinstance(self.path, str) or not os.path.isfile(self.path):
+            return datetime.now()                 # Streams start now
+        duration = self.vs.get(cv2.CAP_PROP_FRAME_COUNT) / self.video_fps
+        return datetime.fromtimestamp(os.path.getmtime(self.path)) - timedelta(seconds=max(duration, 0))
 
-            if self.path is not None:
-                self.frame = self.frame[1]        # For video, grab the frame read
-            if self.frame is None:                # Capture end of video time in case of motion detected in last frame
-                self.current_frame_motion = False
-                self.write_motion_time()
-                break
-            self.text = "Unoccupied"
-            self.current_frame_motion = False
+    # Read next frame from video stream. Returns None at end of video.
+    def read_frame(self):
+        frame = self.vs.read()
+        if self.path is not None or not self.webcam_stream:
+            frame = frame[1]                      # For video, grab the frame read
+        if frame is not None:
+            self.frames_read += 1
+        return frame
 
-            # Resize and perform gaussian blur
-            self.resize_and_blur()
+    # Time of the frame just read: webcam frames use the clock, video frames use their
+    # position in the video (or frame index when the video has no timestamps)
+    def frame_timestamp(self):
+        if self.path is None:
+            return datetime.now()
+        msec = self.vs.get(cv2.CAP_PROP_POS_MSEC)
+        if msec <= 0 and self.frames_read > 1:
+            msec = (self.frames_read - 1) * 1000.0 / self.video_fps
+        return self.start_time + timedelta(milliseconds=msec)
 
-            # Update background average frame
-            self.update_bg()
+    # Release video stream
+    def close_source(self):
+        if self.path is None and self.webcam_stream:
+            self.vs.stop()
+        else:
+            self.vs.release()
 
-            # Remove frame from background
-            self.remove_bg()
+    # Detect motion in the current frame and log motion start/end time
+    def process_frame(self):
+        self.text = "Unoccupied"
+        self.current_frame_motion = False
 
-            # Find motion contours and draw rectangle around motion
-            self.rect = []  # Initialize/reset motion rectangle boxs variable
-            self.find_contour()
-            self.draw_motion()
-            self.last_frame_motion = self.current_frame_motion
+        # Resize and perform gaussian blur
+        self.resize_and_blur()
 
-            # Draw text and timestamp on frame
-            self.add_status_timestamps()
+        # Update background average frame
+        self.update_bg()
 
-            # Display videos
-            cv2.imshow("Security Feed", self.frame)
-            cv2.imshow("Frame Delta", self.frameDelta)
-            cv2.imshow("Mask", self.threshold)
-            if cv2.waitKey(1) & 0xFF == ord("q"):
-                self.current_frame_motion = False
-                self.write_motion_time()
-                break
-        if self.path is None:
-            self.vs.stop()
-        else:
-            self.vs.release()
-        cv2.destroyAllWindows()
+        # Remove frame from background
+        self.remove_bg()
+
+        # Find motion contours and draw rectangle around motion
+        self.rect = []  # Initialize/reset motion rectangle boxs variable
+        self.threshold_mask()
+        self.find_contour()
+        self.draw_motion()
+        self.last_frame_motion = self.current_frame_motion
+        self.events.tick()                  # Write finished motions held longer than flush_seconds
+
+    # Close any open motion at end of video or when stopped
+    def end_motion(self):
+        self.current_frame_motion = False
+        self.write_motion_time()
+        self.events.close()
 
     # Draws rectangles in an image with non-max-suppression to group boxes lumped together
     def draw_detections(self, thickness=1):
-        self.rect = np.array([[x, y, x + w, y + h] for (x, y, w, h) in self.rect])
-        pick = non_max_suppression(self.rect, probs=None, overlapThresh=100)  # Default threshold 0.65
+        if self.reuse_buffers:
+            pick = merge_boxes(self.rect, overlap_thresh=100)
+        else:
+            self.rect = np.array([[x, y, x + w, y + h] for (x, y, w, h) in self.rect])
+            pick = non_max_suppression(self.rect, probs=None, overlapThresh=100)  # Default threshold 0.65
         for (xA, yA, xB, yB) in pick:
             cv2.rectangle(self.frame, (xA, yA), (xB, yB), (0, 255, 0), 2)
+        if self.zones:
+            cv2.polylines(self.frame, [zone.polygon for zone in self.zones], True, (255, 0, 0), 1)
 
     # Writes starts and end time of detected motion
     def write_motion_time(self):
-        with open(self.motion_log, 'a') as f:
-            if self.last_frame_motion == False and self.current_frame_motion == True:
-                # This is motion start up time
-                f.write('\n' + datetime.now().strftime("%Y-%m-%d %H:%M:%S") + ',')
-            elif self.last_frame_motion == True and self.current_frame_motion == False:
-                # This is motion end time
-                f.write(datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+        if self.zones:
+            self.write_zone_times()
+        elif self.last_frame_motion == False and self.current_frame_motion == True:
+            # This is motion start up time
+            self.events.begin(self.frame_time)
+        elif self.last_frame_motion == True and self.current_frame_motion == False:
+            # This is motion end time
+            self.events.end(self.frame_time)
+
+    # Writes start and end time of motions in each zone
+    def write_zone_times(self):
+        for zone in self.zones:
+            active = self.current_frame_motion and zone in self.active_zones
+            if active and not zone.active:
+                self.events.begin(self.frame_time, zone.name)
+                zone.motions += 1
+            elif not active and zone.active:
+                self.events.end(self.frame_time, zone.name)
+            zone.active = active
 
     # Calculate delta from weight background
     def remove_bg(self):
-        self.frameDelta = cv2.absdiff(self.gray, cv2.convertScaleAbs(self.avg_frame))
+        if self.reuse_buffers:
+            cv2.convertScaleAbs(self.avg_frame, dst=self.bg_frame)
+            cv2.absdiff(self.gray, self.bg_frame, dst=self.frameDelta)
+        else:
+            self.frameDelta = cv2.absdiff(self.gray, cv2.convertScaleAbs(self.avg_frame))
 
     # Update weighted background
     def update_bg(self):
@@ -115,17 +203,43 @@ class Motion_Detection():
 
     # Resize and perform gaussian blur on frame
     def resize_and_blur(self):
+        if self.reuse_buffers:
+            if self.frame.shape != self.buffers_shape:
+                self.allocate_buffers(self.frame.shape)
+            cv2.resize(self.frame, self.resized.shape[1::-1], dst=self.resized, interpolation=cv2.INTER_AREA)
+            self.frame = self.resized
+            cv2.cvtColor(self.frame, cv2.COLOR_BGR2GRAY, dst=self.gray_raw)
+            cv2.GaussianBlur(self.gray_raw, (21, 21), 0, dst=self.gray)
+            return
+
         # Resize and perform gaussian blur
         self.frame = imutils.resize(self.frame, width=500)
         self.gray = cv2.cvtColor(self.frame, cv2.COLOR_BGR2GRAY)
         self.gray = cv2.GaussianBlur(self.gray, (21, 21), 0)
 
+    # Create clean mask using threshold and hole filling. With zones, hole filling is
+    # done per zone, over the zone only.
+    def threshold_mask(self):
+        if self.reuse_buffers:
+            cv2.threshold(self.frameDelta, 10, 255, cv2.THRESH_BINARY, dst=self.threshold)
+            if not self.zones:
+                cv2.dilate(self.threshold, None, dst=self.threshold, iterations=8)
+        else:
+            self.threshold = cv2.threshold(self.frameDelta, 10, 255, cv2.THRESH_BINARY)[1]
+            if not self.zones:
+                self.threshold = cv2.dilate(self.threshold, None, iterations=8)
+
     # Find contours and append bounding rectangle to list
     def find_contour(self):
-        # Create clean mask using threshold, hole filling and finding contour
-        self.threshold = cv2.threshold(self.frameDelta, 10, 255, cv2.THRESH_BINARY)[1]
-        self.threshold = cv2.dilate(self.threshold, None, iterations=8)
-        contour = cv2.findContours(self.threshold.copy(), cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        if self.zones:
+            self.find_zone_contour()
+            return
+
+        if self.reuse_buffers:
+            # findContours does not modify its input (OpenCV >= 3.2), no copy needed
+            contour = cv2.findContours(self.threshold, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        else:
+            contour = cv2.findContours(self.threshold.copy(), cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
         contour = imutils.grab_contours(contour)
 
         # Append motion box
@@ -133,6 +247,26 @@ class Motion_Detection():
             if cv2.contourArea(c) >= self.MIN_DETECTION_AREA:
                 self.rect.append(cv2.boundingRect(c))
 
+    # Find contours only in zones with enough changed pixels
+    def find_zone_contour(self):
+        self.active_zones = []
+        for zone in self.zones:
+            boxes = zone.find_boxes(self.threshold)
+            if boxes:
+                self.rect.extend(boxes)
+                self.active_zones.append(zone)
+
+    # Allocate reused frame buffers for input frames of the given shape (same size as imutils.resize)
+    def allocate_buffers(self, shape, width=500):
+        height = int(shape[0] * width / float(shape[1]))
+        self.resized = np.empty((height, width, 3), dtype=np.uint8)    # Resized color frame
+        self.gray_raw = np.empty((height, width), dtype=np.uint8)      # Gray frame before blur
+        self.gray = np.empty((height, width), dtype=np.uint8)          # Blurred gray frame
+        self.bg_frame = np.empty((height, width), dtype=np.uint8)      # 8 bit background average
+        self.frameDelta = np.empty((height, width), dtype=np.uint8)
+        self.threshold = np.empty((height, width), dtype=np.uint8)
+        self.buffers_shape = shape
+
     # Add bounding rectangles to frame and set motion flag
     def draw_motion(self):
         self.draw_detections(self.frame)
@@ -145,14 +279,42 @@ class Motion_Detection():
 
     # Add motion status and timestamp onto frame
     def add_status_timestamps(self):
-        # Draw text and timestamp on frame
-        cv2.putText(self.frame, "Status: {}".format(self.text), (10, 20), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 255), 2)
+        self.draw_status(self.frame, self.text)
+
+    # Draw text and timestamp on a frame
+    def draw_status(self, frame, text):
+        cv2.putText(frame, "Status: {}".format(text), (10, 20), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 255), 2)
         t = datetime.now().strftime("%A %B %d %Y %I:%M:%S%p")
-        cv2.putText(self.frame, t, (10, self.frame.shape[0] - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.35, (0, 0, 255), 1)
+        cv2.putText(frame, t, (10, frame.shape[0] - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.35, (0, 0, 255), 1)
 
     # Rescale frame
     def rescale_frame(self, percent=75):
         width = int(self.frame.shape[1] * percent/ 100)
         height = int(self.frame.shape[0] * percent/ 100)
         dim = (width, height)
-        return cv2.resize(self.frame, dim, interpolation =cv2.INTER_AREA)
\ No newline at end of file
+        return cv2.resize(self.frame, dim, interpolation =cv2.INTER_AREA)
+
+# Vectorized non-maximum suppression of (x, y, w, h) boxes. Returns (x1, y1, x2, y2)
+# boxes like imutils non_max_suppression with probs=None.
+def merge_boxes(rects, overlap_thresh=0.65):
+    if len(rects) == 0:
+        return np.empty((0, 4), dtype=int)
+    boxes = np.array(rects, dtype=int)
+    boxes[:, 2:] += boxes[:, :2]
+    if overlap_thresh >= 1:
+        return boxes                          # Overlap ratio never exceeds 1, nothing is suppressed
+
+    x1, y1, x2, y2 = boxes.T
+    area = (x2 - x1 + 1) * (y2 - y1 + 1)
+    # Overlap of every box pair relative to the area of the second box
+    w = np.maximum(0, np.minimum(x2[:, None], x2) - np.maximum(x1[:, None], x1) + 1)
+    h = np.maximum(0, np.minimum(y2[:, None], y2) - np.maximum(y1[:, None], y1) + 1)
+    overlap = (w * h) / area[None, :]
+
+    order = list(np.argsort(y2))
+    pick = []
+    while order:
+        i = order.pop()
+        pick.append(i)
+        order = [j for j in order if overlap[i, j] <= overlap_thresh]
+    return boxes[pick]
\ No newline at end of file
@@ -0,0 +1,137 @@
+import os
+import json
+import time
+import struct
+import numpy as np
+from datetime import datetime, timedelta
+
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S.%f"              # Millisecond precision after trimming 3 digits
+BINARY_MAGIC = b'MOTIONLOG1\n'
+BINARY_RECORD = struct.Struct('<qqi4x')            # start ms, end ms, zone index (-1 = no zone)
+EPOCH = datetime(1970, 1, 1)
+BINARY_DTYPE = np.dtype([('start', '<i8'), ('end', '<i8'), ('zone', '<i4'), ('pad', 'V4')])
+
+class Motion_Log():
+    """
+    This class writes motion start and end times to a csv file. Rows are kept in
+    memory and written in batches of flush_rows rows or after flush_seconds, whichever
+    comes first, so the file is not opened on every frame. tick() is called for every
+    frame, so finished motions reach the file within flush_seconds even when no other
+    motion ends.
+    Times are datetimes written with millisecond precision. With zones, every row
+    also carries the zone of the motion. Every row ends with a newline, so a reader
+    tailing the file can tell a row still being written. The file is overwritten
+    when opened.
+    """
+    def __init__(self, path, zones=None, flush_rows=100, flush_seconds=5.0):
+        self.path = path
+        self.zones = zones                   # Zone names (None = whole frame)
+        self.flush_rows = flush_rows
+        self.flush_seconds = flush_seconds
+        self.open_motions = {}               # Start time of ongoing motions by zone
+        self.rows = []                       # Finished motions waiting to be written
+        self.last_flush = time.monotonic()
+        self.create()
+
+    # Create the log file with its header
+    def create(self):
+        with open(self.path, 'w') as f:
+            f.write('start,end,zone\n' if self.zones else 'start,end\n')
+
+    # Motion started in zone at time
+    def begin(self, start, zone=None):
+        self.open_motions[zone] = start
+
+    # Motion ended in zone at time
+    def end(self, end, zone=None):
+        start = self.open_motions.pop(zone, None)
+        if start is None:
+            return
+        self.rows.append((start, end, zone))
+        if len(self.rows) >= self.flush_rows:
+            self.flush()
+        else:
+            self.tick()
+
+    # Write buffered motions once flush_seconds have passed since the last flush
+    def tick(self):
+        if self.rows and time.monotonic() - self.last_flush >= self.flush_seconds:
+            self.flush()
+
+    # Write buffered motions to the file
+    def flush(self):
+        if self.rows:
+            self.write(self.rows)
+            self.rows = []
+        self.last_flush = time.monotonic()
+
+    # Append rows to the file
+    def write(self, rows):
+        with open(self.path, 'a') as f:
+            f.write(''.join(format_time(start) + ',' + format_time(end)
+                            + (',' + zone + '\n' if self.zones else '\n')
+                            for start, end, zone in rows))
+
+    # End ongoing motions at time and write everything to the file
+    def close(self, end=None):
+        if end is not None:
+            for zone in list(self.open_motions):
+                self.end(end, zone)
+        self.flush()
+
+class Binary_Motion_Log(Motion_Log):
+    """
+    This class writes motions to an append-only binary file for long running cameras.
+    The file starts with a header line holding the zone names, followed by fixed
+    size records of start and end time (milliseconds since 1970-01-01, local time)
+    and zone index. Records of a file are read back as numpy columns by read_binary_log.
+    Opening an existing file appends to it.
+    """
+    # Write the header unless the file already exists with the same zones
+    def create(self):
+        header = json.dumps({'zones': self.zones or []}).encode() + b'\n'
+        if os.path.isfile(self.path) and os.path.getsize(self.path) > 0:
+            with open(self.path, 'rb') as f:
+                if f.read(len(BINARY_MAGIC)) != BINARY_MAGIC or f.readline() != header:
+                    raise ValueError("{} is not a motion log with zones {}".format(self.path, self.zones))
+            return
+        with open(self.path, 'wb') as f:
+            f.write(BINARY_MAGIC + header)
+
+    def write(self, rows):
+        with open(self.path, 'ab') as f:
+            f.write(b''.join(BINARY_RECORD.pack(to_ms(start), to_ms(end),
+                                                self.zones.index(zone) if self.zones else -1)
+                             for start, end, zone in rows))
+
+# Open a binary motion log for .bin paths, a csv motion log otherwise
+def open_motion_log(path, zones=None, **kwargs):
+    if path.endswith('.bin'):
+        return Binary_Motion_Log(path, zones, **kwargs)
+    return Motion_Log(path, zones, **kwargs)
+
+# Read a binary motion log into columns: start and end as datetime64[ms] arrays, zone names.
+# Records before record number `first` are skipped.
+def read_binary_log(path, first=0):
+    with open(path, 'rb') as f:
+        if f.read(len(BINARY_MAGIC)) != BINARY_MAGIC:
+            raise ValueError("{} is not a binary motion log".format(path))
+        zones = json.loads(f.readline())['zones']
+        offset = f.tell() + first * BINARY_DTYPE.itemsize
+    count = (os.path.getsize(path) - offset) // BINARY_DTYPE.itemsize
+    if count > 0:
+        records = np.memmap(path, dtype=BINARY_DTYPE, mode='r', offset=offset, shape=(count,))
+    else:
+        records = np.empty(0, dtype=BINARY_DTYPE)
+    names = np.array(zones + [''], dtype=object)
+    return {'start': records['start'].astype('datetime64[ms]'),
+            'end': records['end'].astype('datetime64[ms]'),
+            'zone': names[records['zone']]}
+
+# Datetime as text with millisecond precision
+def format_time(t):
+    return t.strftime(TIME_FORMAT)[:-3]
+
+# Naive datetime as milliseconds since 1970-01-01 (read back as the same datetime64)
+def to_ms(t):
+    return (t - EPOCH) // timedelta(milliseconds=1)
@@ -0,0 +1,172 @@
+import cv2
+import time
+import queue
+import threading
+from motion import Motion_Detection
+
+class Motion_Pipeline(Motion_Detection):
+    """
+    This class runs motion detection without a display. Work is split into a reader
+    thread that decodes frames, a processing stage that detects motion and writes
+    the motion log, and an optional render/record stage that draws the boxes and
+    writes them to a video file and/or displays them. Stages are joined by bounded
+    queues so decoding overlaps processing. Motion log output is the same as
+    Motion_Detection. Sustained frames per second is reported when the video ends.
+    Video source can either be a saved file (file path) or the webcam (None). The
+    webcam is read by a blocking capture in the reader thread, so every frame is a
+    new camera frame and the fps reported counts camera frames.
+    See Motion_Detection for reuse_buffers, zones and start_time.
+    """
+    def __init__(self, path, log, record=None, display=False, queue_size=32,
+                 drop_frames=None, max_frames=None, report_every=0, stall_timeout=None,
+                 reuse_buffers=False, zones=None, start_time=None):
+        self.setup(path, log, reuse_buffers, zones, start_time)
+        # The reader thread waits on the camera for each new frame: imutils' VideoStream
+        # returns its latest frame at once, so the reader would spin and queue repeats
+        self.webcam_stream = False
+        self.record = record                 # Output video path for rendered frames (None = no recording)
+        self.display = display               # Show rendered frames in windows
+        self.max_frames = max_frames         # Stop after this many frames (None = whole video)
+        self.report_every = report_every     # Print fps every n seconds while running (0 = off)
+        self.stall_timeout = stall_timeout   # Give up if no frame is decoded for n seconds (None = wait forever)
+        # Live streams drop the oldest frame when processing falls behind, files never drop
+        self.drop_frames = (path is None) if drop_frames is None else drop_frames
+
+        self.frame_queue = queue.Queue(maxsize=queue_size)   # Reader -> processing
+        self.render_queue = queue.Queue(maxsize=queue_size)  # Processing -> render/record
+        self.stop_event = threading.Event()
+        self.frame_count = 0
+        self.dropped_frames = 0
+        self.elapsed = 0.0
+        self.fps = 0.0
+        self.stalled = False
+
+        self.open_source()
+        self.reader = threading.Thread(target=self.read_loop, daemon=True)
+        self.renderer = None
+        if self.record is not None or self.display:
+            self.renderer = threading.Thread(target=self.render_loop, daemon=True)
+
+        try:
+            self.reader.start()
+            if self.renderer is not None:
+                self.renderer.start()
+            self.process_loop()
+        finally:
+            self.stop_event.set()
+            while self.reader.is_alive() and not self.stalled:  # Unblock reader waiting on a full queue
+                try:
+                    self.frame_queue.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+            if self.renderer is not None:
+                self.put(self.render_queue, None, self.renderer)
+                self.renderer.join()
+            if not self.stalled:                   # A stalled reader may still be inside the decoder
+                self.close_source()
+
+        print("Processed %d frames in %.2f s (%.1f fps, %d dropped)"
+              % (self.frame_count, self.elapsed, self.fps, self.dropped_frames))
+        for zone in self.zones:
+            print("Zone {zone}: {motions} motions, {active_frames}/{frames} active frames, "
+                  "{contour_frames} contour searches".format(**zone.summary()))
+
+    # Put item in queue, waiting for space unless the pipeline is stopping.
+    # End markers (None) always wait as long as the consumer thread is alive.
+    def put(self, q, item, consumer=None):
+        while consumer is None or consumer.is_alive():
+            try:
+                q.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                if self.stop_event.is_set() and item is not None:
+                    return
+
+    # Reader stage: decode frames and their timestamps into the frame queue
+    def read_loop(self):
+        count = 0
+        while not self.stop_event.is_set():
+            frame = self.read_frame()
+            if frame is None or (self.max_frames is not None and count >= self.max_frames):
+                break
+            count += 1
+            item = (frame, self.frame_timestamp())
+            if self.drop_frames and self.frame_queue.full():
+                try:
+                    self.frame_queue.get_nowait()  # Discard oldest frame to stay real time
+                    self.dropped_frames += 1
+                except queue.Empty:
+                    pass
+            self.put(self.frame_queue, item)
+        self.put(self.frame_queue, None)           # End of video marker
+
+    # Processing stage: detect motion and hand results to the render stage
+    def process_loop(self):
+        start = time.perf_counter()
+        last_report = start
+        last_frame = start
+        while True:
+            try:
+                item = self.frame_queue.get(timeout=0.1)
+                last_frame = time.perf_counter()
+            except queue.Empty:
+                if self.stall_timeout is not None and time.perf_counter() - last_frame > self.stall_timeout:
+                    self.stalled = True
+                    self.end_motion()
+                    raise TimeoutError("No frame decoded from {} for {} s".format(self.path, self.stall_timeout))
+                if self.reader.is_alive() and not self.stop_event.is_set():
+                    continue
+                item = None                        # Reader stopped without end marker
+            if item is None or self.stop_event.is_set():
+                self.end_motion()                  # Capture end of video time in case of motion detected in last frame
+                break
+            self.frame, self.frame_time = item
+            self.process_frame()
+            self.frame_count += 1
+
+            if self.renderer is not None:
+                frames = (self.frame, self.frameDelta, self.threshold)
+                if self.reuse_buffers:             # Buffers are overwritten by the next frame
+                    frames = tuple(f.copy() for f in frames)
+                self.put(self.render_queue, (frames[0], self.text, frames[1], frames[2]), self.renderer)
+
+            now = time.perf_counter()
+            if self.report_every and now - last_report >= self.report_every:
+                print("%d frames, %.1f fps" % (self.frame_count, self.frame_count / (now - start)))
+                last_report = now
+        self.elapsed = time.perf_counter() - start
+        if self.elapsed > 0:
+            self.fps = self.frame_count / self.elapsed
+
+    # Render/record stage: draw status and timestamp, then record and/or display frames
+    def render_loop(self):
+        writer = None
+        while True:
+            item = self.render_queue.get()
+            if item is None:
+                break
+            frame, text, delta, threshold = item
+            self.draw_status(frame, text)
+
+            if self.record is not None:
+                if writer is None:
+                    height, width = frame.shape[:2]
+                    writer = cv2.VideoWriter(self.record, cv2.VideoWriter_fourcc(*'mp4v'),
+                                             self.source_fps(), (width, height))
+                writer.write(frame)
+            if self.display:
+                cv2.imshow("Security Feed", frame)
+                cv2.imshow("Frame Delta", delta)
+                cv2.imshow("Mask", threshold)
+                if cv2.waitKey(1) & 0xFF == ord("q"):
+                    self.stop_event.set()
+        if writer is not None:
+            writer.release()
+        if self.display:
+            cv2.destroyAllWindows()
+
+    # Frame rate of the video source, used for the recorded video
+    def source_fps(self):
+        if self.path is not None:
+            return self.video_fps
+        return 20.0
@@ -1,3 +1,8 @@
+import io
+import os
+import math
+import time
+import numpy as np
 import pandas as pd
 import holoviews as hv
 from holoviews import opts
@@ -5,58 +10,263 @@ from holoviews import opts
 hv.extension('bokeh')
 from datetime import datetime
 from bokeh.models.formatters import DatetimeTickFormatter
+from motion_log import read_binary_log, BINARY_MAGIC, BINARY_DTYPE
+
+MARK_BYTES = 64  # Bytes before the read position compared to recognize a rewritten log
 
 class plot_motion():
     """
     This app reads a csv file indicating motions detected with a start and an end time.
     The motion is then plotted over runtime using holoviews in a 1D graph. An interactive
     graph is then saved in html format. The folder path of the motion file and the motion
-    file name needs to be provided.
+    file name needs to be provided. Overlapping and adjacent motions (less than gap
+    seconds apart) are merged and drawn as one set of bars. When more than
+    max_intervals merged motions are in view, the fraction of time with motion in
+    each of `bins` time bins across the view is drawn instead. The graph is redrawn
+    for the time range in view when zooming in a live session (notebook or bokeh
+    server), so zooming into a long log shows its motions again; the saved html
+    holds the view of the whole log. Binary motion logs (.bin) are read too.
     """
-    def __init__(self, folder, file):
+    def __init__(self, folder, file, gap=0, max_intervals=5000, bins=2000):
         self.folder = folder  # Folder path
         self.file = file  # Motion log path
+        self.gap = gap  # Motions less than gap seconds apart are merged
+        self.max_intervals = max_intervals  # Most motions drawn as bars
+        self.bins = bins  # Time bins of the density graph
 
-        self.motion_time = pd.read_csv(folder + file)  # Read motion log into panda
-
-        # Convert date record to datetime format
-        self.motion_time['start'] = pd.to_datetime(self.motion_time['start'],
-                                                   format="%Y-%m-%d %H:%M:%S")
-        self.motion_time['end'] = pd.to_datetime(self.motion_time['end'],
-                                                 format="%Y-%m-%d %H:%M:%S")
-
-        # Initialize graph containers
-        self.vspan = [''] * self.motion_time.shape[0]
-        self.layout = hv.VSpan()
+        self.motion_time = read_motion_times(folder + file)  # Read motion log into panda
 
-        # Combine and plot motion bars
+        # Merge overlapping motions and plot motion bars
+        self.intervals = merge_intervals(self.motion_time, self.gap)
         self.combine()
 
-        # Convert default datetime formatter in nanoseconds to readable format
-        dtf2 = DatetimeTickFormatter(months='%I:%M:%S %P\n%b-%d',
-                                     days='%I:%M:%S %P\n%b-%d',
-                                     hours='%I:%M:%S %P\n%b-%d',
-                                     minutes='%I:%M:%S %P\n%b-%d')
-        # Set graph format
-        self.layout.opts(opts.VSpan(height=150,
-                                    responsive=True,
-                                    yticks=0,
-                                    ylabel='START',
-                                    xlabel='',
-                                    color='red',
-                                    apply_ranges=True,
-                                    xformatter=dtf2))
-
         # Display and save graph
         self.layout
         self.save()
 
-    # Combine VSpan bars (i.e. individual motions) into one graph
+    # Combine motions into one glyph collection: bars, or motion density when too many are in view
     def combine(self):
-        for i in range(self.motion_time.shape[0]):
-            self.vspan[i] = hv.VSpan(self.motion_time["start"][i], self.motion_time["end"][i])
-            self.layout = self.layout * self.vspan[i]
+        self.layout = motion_graph(self.intervals, self.max_intervals, self.bins)
 
     # Save graph
     def save(self):
         hv.save(self.layout, self.folder + r'motion_graph.html')
+
+class live_plot_motion(plot_motion):
+    """
+    This app keeps the motion graph of a motion log up to date while the log is still
+    being written. Only rows appended since the last update are parsed; they are merged
+    into the cached merged motions, and only the motions they can overlap are merged
+    again. The graph is saved again after every update with new rows. The saved html
+    reloads itself every `refresh` seconds, rounded up to whole seconds (at least 1)
+    as browsers only take whole seconds, so an open browser tab stays current.
+    Call update() to check the log once or watch() to keep checking it.
+    """
+    def __init__(self, folder, file, gap=0, max_intervals=5000, bins=2000, refresh=5):
+        self.folder = folder  # Folder path
+        self.file = file  # Motion log path
+        self.gap = gap  # Motions less than gap seconds apart are merged
+        self.max_intervals = max_intervals  # Most motions drawn as bars
+        self.bins = bins  # Time bins of the density graph
+        self.refresh = refresh  # Seconds between checks of the log and browser reloads
+
+        self.tail = Motion_Log_Tail(folder + file)
+        self.intervals = merge_intervals(pd.DataFrame({'start': [], 'end': []}))
+        self.update()
+
+    # Merge rows appended to the log into the graph. Returns the number of new rows.
+    def update(self):
+        restarted = self.tail.restarted()
+        if restarted:
+            self.intervals = merge_intervals(pd.DataFrame({'start': [], 'end': []}))
+        rows = self.tail.read()
+        if len(rows) == 0 and not restarted and os.path.isfile(self.folder + r'motion_graph.html'):
+            return 0
+
+        if len(rows) > 0:
+            # Merged motions are sorted and never overlap, so only the ones ending after the
+            # earliest new start (a suffix) can merge with the new rows
+            earliest = rows['start'].min() - pd.Timedelta(seconds=self.gap)
+            keep = np.searchsorted(self.intervals['end'].to_numpy(dtype='datetime64[ns]'),
+                                   np.datetime64(earliest, 'ns'), side='left')
+            merged = merge_intervals(pd.concat([self.intervals.iloc[keep:], rows[['start', 'end']]]), self.gap)
+            self.intervals = pd.concat([self.intervals.iloc[:keep], merged], ignore_index=True)
+        self.combine()
+        self.save()
+        return len(rows)
+
+    # Save graph with a browser reload tag
+    def save(self):
+        path = self.folder + r'motion_graph.html'
+        hv.save(self.layout, path)
+        with open(path, encoding='utf-8') as f:
+            html = f.read()
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(html.replace('<head>', '<head>\n<meta http-equiv="refresh" content="%d">' % max(math.ceil(self.refresh), 1), 1))
+
+    # Keep updating the graph every refresh seconds, for `duration` seconds (None = forever)
+    def watch(self, duration=None):
+        end = None if duration is None else time.monotonic() + duration
+        while end is None or time.monotonic() < end:
+            time.sleep(self.refresh)
+            self.update()
+
+class Motion_Log_Tail():
+    """
+    This class reads the rows appended to a csv or binary motion log since the last
+    read. It remembers the byte offset (csv) or record count (binary) already read.
+    A csv row is only read once its newline is written. A log rewritten by a new
+    detection run is read again from the start: it is recognized by a new file
+    (inode), a size below the position read, or bytes before that position that
+    are not the ones read, which catches a rewrite already longer than the old log.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.offset = 0  # Bytes (csv) or records (binary) already read
+        self.columns = None  # Csv header
+        self.mark = None  # Inode, byte position read up to and the bytes before it
+
+    # Check if the log was rewritten since the last read and start over if so
+    def restarted(self):
+        if self.mark is None or self.mark == self.file_mark(self.mark[1]):
+            return False
+        self.offset = 0
+        self.columns = None
+        self.mark = None
+        return True
+
+    # Inode, position and the MARK_BYTES before position of the log (None if missing or shorter)
+    def file_mark(self, position):
+        try:
+            with open(self.path, 'rb') as f:
+                inode = os.fstat(f.fileno()).st_ino
+                f.seek(max(position - MARK_BYTES, 0))
+                data = f.read(position - max(position - MARK_BYTES, 0))
+        except OSError:
+            return None
+        return (inode, position, data) if len(data) == min(position, MARK_BYTES) else None
+
+    # Read new rows into a data frame with datetime start and end columns
+    def read(self):
+        if not os.path.isfile(self.path):
+            return pd.DataFrame({'start': [], 'end': []})
+        if self.path.endswith('.bin'):
+            rows = pd.DataFrame(read_binary_log(self.path, self.offset))
+            self.offset += len(rows)
+            if len(rows) > 0:
+                with open(self.path, 'rb') as f:
+                    f.read(len(BINARY_MAGIC))
+                    f.readline()  # Zones header
+                    self.mark = self.file_mark(f.tell() + self.offset * BINARY_DTYPE.itemsize)
+            return rows
+
+        with open(self.path, 'rb') as f:
+            f.seek(self.offset)
+            chunk = f.read()
+        chunk = chunk[:chunk.rfind(b'\n') + 1]  # Complete lines only
+        self.offset += len(chunk)
+        if chunk:
+            self.mark = self.file_mark(self.offset)
+        if self.columns is None and chunk:
+            header, chunk = chunk.split(b'\n', 1)
+            self.columns = header.decode().strip().split(',')
+        if not chunk.strip():
+            return pd.DataFrame({'start': [], 'end': []})
+
+        rows = pd.read_csv(io.BytesIO(chunk), header=None, names=self.columns)
+        rows['start'] = pd.to_datetime(rows['start'], format="ISO8601")
+        rows['end'] = pd.to_datetime(rows['end'], format="ISO8601")
+        return rows
+
+# Graph of merged motions that follows the zoom: for the time range in view, one set of
+# bars, or motion density over bins across the view when more than max_intervals motions
+# are in it. Both are drawn as rectangles so the graph keeps one element type.
+def motion_graph(intervals, max_intervals=5000, bins=2000):
+    starts = intervals['start'].to_numpy(dtype='datetime64[ns]')
+    ends = intervals['end'].to_numpy(dtype='datetime64[ns]')
+
+    def view(x_range):
+        if len(starts) == 0:
+            return hv.Rectangles([])
+        span = (starts[0], ends[-1])
+        if x_range is not None:
+            span = (max(np.datetime64(x_range[0], 'ns'), starts[0]), min(np.datetime64(x_range[1], 'ns'), ends[-1]))
+        # Merged motions are sorted and never overlap, so the ones in view are a slice
+        first = np.searchsorted(ends, span[0], side='left')
+        last = np.searchsorted(starts, span[1], side='right')
+        if last - first <= max_intervals or span[1] <= span[0]:
+            shown = slice(first, last)
+            return hv.Rectangles((starts[shown], np.zeros(last - first), ends[shown], np.ones(last - first)))
+        edges, density = motion_density(intervals.iloc[first:last], bins, span)
+        return hv.Rectangles((edges[:-1], np.zeros(bins), edges[1:], density))
+
+    graph = hv.DynamicMap(view, streams=[hv.streams.RangeX()])
+
+    # Convert default datetime formatter in nanoseconds to readable format
+    dtf2 = DatetimeTickFormatter(months='%I:%M:%S %P\n%b-%d',
+                                 days='%I:%M:%S %P\n%b-%d',
+                                 hours='%I:%M:%S %P\n%b-%d',
+                                 minutes='%I:%M:%S %P\n%b-%d')
+    # Set graph format
+    return graph.opts(opts.Rectangles(height=150, responsive=True, xlabel='', ylabel='MOTION', ylim=(0, 1),
+                                      color='red', line_alpha=0, xformatter=dtf2))
+
+# Read a csv or binary motion log into a data frame with datetime start and end columns
+def read_motion_times(path):
+    if path.endswith('.bin'):
+        return pd.DataFrame(read_binary_log(path))
+    motion_time = pd.read_csv(path)
+    # Convert date record to datetime format (with or without milliseconds)
+    motion_time['start'] = pd.to_datetime(motion_time['start'], format="ISO8601")
+    motion_time['end'] = pd.to_datetime(motion_time['end'], format="ISO8601")
+    return motion_time
+
+# Merge overlapping motions and motions less than gap seconds apart
+def merge_intervals(motion_time, gap=0):
+    motion_time = motion_time.dropna(subset=['start', 'end'])
+    start = motion_time['start'].to_numpy(dtype='datetime64[ns]')
+    end = motion_time['end'].to_numpy(dtype='datetime64[ns]')
+    order = np.argsort(start, kind='stable')
+    start, end = start[order], np.maximum(end[order], start[order])
+    if len(start) == 0:
+        return pd.DataFrame({'start': start, 'end': end})
+
+    # A motion starts a new group when it starts after every earlier motion ended
+    reach = np.maximum.accumulate(end)
+    new_group = np.empty(len(start), dtype=bool)
+    new_group[0] = True
+    new_group[1:] = start[1:] > reach[:-1] + np.timedelta64(int(gap * 1e9), 'ns')
+    first = np.flatnonzero(new_group)
+    last = np.append(first[1:], len(start)) - 1
+    return pd.DataFrame({'start': start[first], 'end': reach[last]})
+
+# Fraction of time with motion in equal time bins, from merged (non-overlapping) motions.
+# The bins cover span (start, end) if given, else the motions.
+def motion_density(intervals, bins, span=None):
+    start = intervals['start'].to_numpy(dtype='datetime64[ns]').astype(np.int64)
+    end = intervals['end'].to_numpy(dtype='datetime64[ns]').astype(np.int64)
+    if span is None:
+        span = (start[0], end[-1])
+    span = np.array(span, dtype='datetime64[ns]').astype(np.int64)
+    edges = np.linspace(span[0], span[1], bins + 1)
+
+    # Motion time before each edge: full motions that ended plus the part of the current one
+    before = np.concatenate(([0], np.cumsum(end - start)))
+    k = np.searchsorted(start, edges, side='right')
+    current = np.clip(edges - start[np.maximum(k - 1, 0)], 0, (end - start)[np.maximum(k - 1, 0)])
+    covered = before[np.maximum(k - 1, 0)] + np.where(k > 0, current, 0)
+    density = np.diff(covered) / np.diff(edges)
+    return edges.astype('datetime64[ns]'), density
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description="Plot a motion log, optionally updating it while it is written.")
+    parser.add_argument('folder', help="folder of the motion log, ending with a path separator")
+    parser.add_argument('file', help="motion log file name (.csv or .bin)")
+    parser.add_argument('--watch', action='store_true', help="keep updating the graph as the log grows")
+    parser.add_argument('--refresh', type=float, default=5, help="seconds between updates when watching")
+    args = parser.parse_args()
+    if args.watch:
+        live_plot_motion(args.folder, args.file, refresh=args.refresh).watch()
+    else:
+        plot_motion(args.folder, args.file)
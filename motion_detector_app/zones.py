@@ -0,0 +1,95 @@
+import cv2
+import json
+import imutils
+import numpy as np
+
+DILATE_ITERATIONS = 8     # Same hole filling as Motion_Detection.find_contour
+
+class Zone():
+    """
+    This class is a region of the frame watched for motion, such as a door or a
+    driveway. A zone is either a rectangle (x, y, w, h) or a polygon [(x, y), ...] in
+    coordinates of the resized 500 pixel wide frame. The zone mask is computed once
+    per frame size over the zone bounding box. Each frame, changed pixels inside the
+    mask are counted and only zones with at least min_pixels changed pixels are
+    dilated and searched for contours. Contours smaller than min_area are ignored.
+    Activity counters are kept for every zone.
+    """
+    def __init__(self, name, rect=None, polygon=None, min_area=200, min_pixels=1):
+        if (rect is None) == (polygon is None):
+            raise ValueError("Zone {} needs either a rect or a polygon".format(name))
+        if rect is not None:
+            x, y, w, h = rect
+            polygon = [(x, y), (x + w, y), (x + w, y + h), (x, y + h)]
+        self.name = name
+        self.polygon = np.array(polygon, dtype=np.int32)
+        self.min_area = min_area              # Minimum contour area counted as motion
+        self.min_pixels = min_pixels          # Minimum changed pixels before contours are searched
+        self.shape = None                     # Frame shape the mask is built for
+        self.active = False                   # Motion ongoing in the zone
+
+        self.frames = 0                       # Frames checked
+        self.active_frames = 0                # Frames with motion in the zone
+        self.contour_frames = 0               # Frames the zone passed the pixel check
+        self.motions = 0                      # Motion events started in the zone
+        self.changed_pixels = 0               # Changed pixels counted in the zone over all frames
+
+    # Precompute zone mask and buffers over the zone bounding box, padded for dilation
+    def build(self, shape):
+        height, width = shape[:2]
+        x, y, w, h = cv2.boundingRect(self.polygon)
+        self.x0 = max(x - DILATE_ITERATIONS, 0)
+        self.y0 = max(y - DILATE_ITERATIONS, 0)
+        self.x1 = min(x + w + DILATE_ITERATIONS, width)
+        self.y1 = min(y + h + DILATE_ITERATIONS, height)
+        roi_shape = (max(self.y1 - self.y0, 0), max(self.x1 - self.x0, 0))
+
+        self.mask = np.zeros(roi_shape, dtype=np.uint8)
+        cv2.fillPoly(self.mask, [self.polygon - (self.x0, self.y0)], 255)
+        self.masked = np.empty(roi_shape, dtype=np.uint8)
+        self.dilated = np.empty(roi_shape, dtype=np.uint8)
+        self.shape = shape
+
+    # Count changed pixels of a threshold frame inside the zone
+    def count_changed(self, threshold):
+        if threshold.shape != self.shape:
+            self.build(threshold.shape)
+        roi = threshold[self.y0:self.y1, self.x0:self.x1]
+        cv2.bitwise_and(roi, self.mask, dst=self.masked)
+        count = cv2.countNonZero(self.masked)
+        self.frames += 1
+        self.changed_pixels += count
+        return count
+
+    # Return motion boxes (x, y, w, h) in frame coordinates found in the zone of a threshold frame
+    def find_boxes(self, threshold):
+        if self.count_changed(threshold) < self.min_pixels:
+            return []
+        self.contour_frames += 1
+
+        # Dilate over the padded box so motion near the edge fills in like a full frame dilation
+        roi = threshold[self.y0:self.y1, self.x0:self.x1]
+        cv2.dilate(roi, None, dst=self.dilated, iterations=DILATE_ITERATIONS)
+        cv2.bitwise_and(self.dilated, self.mask, dst=self.dilated)
+        contour = cv2.findContours(self.dilated, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        contour = imutils.grab_contours(contour)
+
+        boxes = []
+        for c in contour:
+            if cv2.contourArea(c) >= self.min_area:
+                x, y, w, h = cv2.boundingRect(c)
+                boxes.append((x + self.x0, y + self.y0, w, h))
+        if boxes:
+            self.active_frames += 1
+        return boxes
+
+    # Activity counters of the zone
+    def summary(self):
+        return {'zone': self.name, 'frames': self.frames, 'active_frames': self.active_frames,
+                'contour_frames': self.contour_frames, 'motions': self.motions,
+                'changed_pixels': self.changed_pixels}
+
+# Load zones from a json file: [{"name": "door", "rect": [x, y, w, h], "min_area": 100}, ...]
+def load_zones(path):
+    with open(path) as f:
+        return [Zone(**zone) for zone in json.load(f)]
@@ -0,0 +1,122 @@
+import os
+import sys
+import html
+import json
+import time
+import argparse
+import tempfile
+import numpy as np
+import pandas
+import folium
+from folium.plugins import FastMarkerCluster
+
+COLORS = ['green', 'orange', 'red']  #Elevation classes: below 1000 m, 1000 to 3000 m, 3000 m and up
+
+#Marker of one data row [lat, lon, color class, popup text] drawn by the browser
+MARKER_CALLBACK = """
+function (row) {
+    var colors = %s;
+    var marker = L.circleMarker(new L.LatLng(row[0], row[1]),
+        {radius: 6, color: 'grey', fill: true, fillColor: colors[row[2]], fillOpacity: 0.7});
+    marker.bindPopup(row[3]);
+    return marker;
+}""" % json.dumps(COLORS)
+
+#Load volcano names, coordinates and elevations from a csv file
+def load_volcanoes(path):
+    return pandas.read_csv(path, header=0)[["NAME", "LAT", "LON", "ELEV"]]
+
+#Color class (index into COLORS) of every elevation, same classes as elev_to_color
+def elev_classes(elev):
+    elev = np.asarray(elev, dtype=float)
+    return np.select([elev < 1000, elev < 3000], [0, 1], default=2)
+
+#Color of every elevation
+def elev_colors(elev):
+    return np.array(COLORS)[elev_classes(elev)]
+
+#Popup text of every volcano: name and elevation
+def popups(volcanos):
+    return [html.escape(str(name)) + " \n" + str(elev) for name, elev in zip(volcanos["NAME"], volcanos["ELEV"])]
+
+#GeoJSON feature collection of the volcanoes with their color baked into the properties.
+#Coordinates are rounded to `precision` decimals (5 decimals is about 1 m).
+def volcano_features(volcanos, precision=5):
+    lat = volcanos["LAT"].to_numpy(dtype=float).round(precision).tolist()
+    lon = volcanos["LON"].to_numpy(dtype=float).round(precision).tolist()
+    colors = elev_colors(volcanos["ELEV"]).tolist()
+    return {"type": "FeatureCollection",
+            "features": [{"type": "Feature",
+                          "geometry": {"type": "Point", "coordinates": [x, y]},
+                          "properties": {"popup": text, "color": color}}
+                         for y, x, text, color in zip(lat, lon, popups(volcanos), colors)]}
+
+#Feature group of volcano markers colored by elevation. Up to cluster_above volcanoes are
+#drawn as one GeoJSON layer of circle markers. More are sent as one compact array and
+#drawn by the browser in marker clusters (FastMarkerCluster), which keeps the html small
+#and the map fast with 100k+ points.
+def volcano_layer(volcanos, name="Volcanoes", cluster_above=1000, precision=5):
+    layer = folium.FeatureGroup(name=name)
+    if len(volcanos) <= cluster_above:
+        folium.GeoJson(volcano_features(volcanos, precision),
+                       marker=folium.CircleMarker(radius=6, fill=True, color='grey', fill_opacity=0.7),
+                       style_function=lambda feature: {'fillColor': feature['properties']['color']},
+                       popup=folium.GeoJsonPopup(fields=["popup"], labels=False)).add_to(layer)
+    else:
+        data = list(zip(volcanos["LAT"].to_numpy(dtype=float).round(precision).tolist(),
+                        volcanos["LON"].to_numpy(dtype=float).round(precision).tolist(),
+                        elev_classes(volcanos["ELEV"]).tolist(),
+                        popups(volcanos)))
+        FastMarkerCluster(data, callback=MARKER_CALLBACK).add_to(layer)
+    return layer
+
+#One CircleMarker per volcano, as the notebook used to build the layer (for comparison)
+def marker_loop_layer(volcanos, name="Volcanoes"):
+    layer = folium.FeatureGroup(name=name)
+    for name, lat, lon, elev, color in zip(volcanos["NAME"], volcanos["LAT"], volcanos["LON"], volcanos["ELEV"],
+                                           elev_colors(volcanos["ELEV"])):
+        layer.add_child(folium.CircleMarker(location=[lat, lon], radius=6, popup=name + " \n" + str(elev), fill=True,
+                                            fill_color=color, color='grey', fill_opacity=0.7))
+    return layer
+
+#Build a map with the volcano layer, save it to path and return build time and html size
+def build_volcano_map(volcanos, path, layer=volcano_layer):
+    start = time.perf_counter()
+    map = folium.Map(location=[38.58, -99.09], zoom_start=5)
+    map.add_child(layer(volcanos))
+    map.save(path)
+    return {"points": len(volcanos),
+            "build_s": round(time.perf_counter() - start, 3),
+            "html_kb": round(os.path.getsize(path) / 2 ** 10, 1)}
+
+#Synthetic volcanoes: n random points over the USA with random elevations
+def synthetic_volcanoes(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return pandas.DataFrame({"NAME": ["Volcano %d" % i for i in range(n)],
+                             "LAT": rng.uniform(19, 65, n),
+                             "LON": rng.uniform(-170, -67, n),
+                             "ELEV": rng.uniform(0, 4500, n).round()})
+
+#Compare the marker loop with the layer builder on the volcano file and synthetic points
+def run_benchmark(path="Volcanoes_USA.txt", sizes=(1000, 10000, 100000), loop_limit=10000):
+    results = []
+    datasets = [(os.path.basename(path), load_volcanoes(path))] + [("synthetic", synthetic_volcanoes(n)) for n in sizes]
+    with tempfile.TemporaryDirectory() as folder:
+        for source, volcanos in datasets:
+            methods = [("volcano_layer", volcano_layer)]
+            if len(volcanos) <= loop_limit:
+                methods.append(("marker_loop", marker_loop_layer))
+            for method, layer in methods:
+                result = build_volcano_map(volcanos, os.path.join(folder, "map.html"), layer)
+                result.update({"source": source, "method": method})
+                results.append(result)
+                print(json.dumps(result), file=sys.stderr)
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark building the volcano layer of the web map.")
+    parser.add_argument("volcanoes", nargs="?", default="Volcanoes_USA.txt", help="volcano csv file")
+    parser.add_argument("--sizes", nargs="+", type=int, default=[1000, 10000, 100000], help="synthetic point counts")
+    parser.add_argument("--loop-limit", type=int, default=10000, help="largest point count built with the marker loop")
+    args = parser.parse_args()
+    print(json.dumps(run_benchmark(args.volcanoes, args.sizes, args.loop_limit), indent=2))
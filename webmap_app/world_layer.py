@@ -0,0 +1,323 @@
+import os
+import json
+import math
+import time
+import hashlib
+import argparse
+import tempfile
+import folium
+from folium.template import Template
+
+CACHE_VERSION = 3  #Change when the preprocessing changes, so old cache files are not used
+SNAP_DECIMALS = 4  #Border points closer than this (about 10 m) are taken as the same point
+
+class Compact_TopoJson(folium.TopoJson):
+    """
+    This class is folium's TopoJson layer with its data written as compact json. Folium
+    writes it with a space after every comma and colon, about a sixth of the size of a
+    quantized topology. Country styles come from feature.properties.style as in folium.
+    """
+    _template = Template("""
+        {% macro script(this, kwargs) %}
+            var {{ this.get_name() }}_data = {{ this.compact_data }};
+            var {{ this.get_name() }} = L.geoJson(
+                topojson.feature(
+                    {{ this.get_name() }}_data,
+                    {{ this.get_name() }}_data{{ this._safe_object_path }}
+                )
+            ).addTo({{ this._parent.get_name() }});
+            {{ this.get_name() }}.setStyle(function(feature) {
+                return feature.properties.style;
+            });
+        {% endmacro %}
+        """)
+
+    def render(self, **kwargs):
+        self.style_data()
+        #Escaped like jinja's tojson so the data cannot end the script tag
+        self.compact_data = (json.dumps(self.data, separators=(',', ':')).replace('<', '\\u003c')
+                             .replace('>', '\\u003e').replace('&', '\\u0026').replace("'", '\\u0027'))
+        super().render(**kwargs)
+
+#Population color of a country, same classes as the notebook's style function
+def pop_color(pop):
+    if pop < 10000000:
+        return 'green'
+    elif pop < 20000000:
+        return 'orange'
+    else:
+        return 'red'
+
+#Simplification tolerance in degrees that is about `pixels` screen pixels at a zoom level
+def tolerance_for_zoom(zoom, pixels=1.0):
+    return pixels * 360 / (256 * 2 ** zoom)
+
+#Simplify a line (or closed ring) with the Ramer-Douglas-Peucker algorithm: keep the
+#points further than tolerance from the line through the points kept around them
+def simplify(points, tolerance):
+    if len(points) < 3:
+        return points
+    keep = [False] * len(points)
+    keep[0] = keep[-1] = True
+    tolerance2 = tolerance * tolerance
+    stack = [(0, len(points) - 1)]
+    while stack:
+        first, last = stack.pop()
+        ax, ay = points[first]
+        dx, dy = points[last][0] - ax, points[last][1] - ay
+        length2 = dx * dx + dy * dy
+        farthest, index = -1.0, None
+        for i in range(first + 1, last):
+            px, py = points[i][0] - ax, points[i][1] - ay
+            #Distance to the segment (to its start point for a closed ring)
+            t = 0.0 if length2 == 0 else min(1.0, max(0.0, (px * dx + py * dy) / length2))
+            ex, ey = px - t * dx, py - t * dy
+            distance = ex * ex + ey * ey
+            if distance > farthest:
+                farthest, index = distance, i
+        if farthest > tolerance2:
+            keep[index] = True
+            stack.append((first, index))
+            stack.append((index, last))
+    return [point for point, kept in zip(points, keep) if kept]
+
+#Rings of a Polygon or MultiPolygon geometry by polygon, as lists of (x, y) points
+#snapped to SNAP_DECIMALS, without repeated points or the closing point
+def geometry_rings(geometry):
+    polygons = geometry['coordinates'] if geometry['type'] == 'MultiPolygon' else [geometry['coordinates']]
+    rings = []
+    for polygon in polygons:
+        rings.append([])
+        for ring in polygon:
+            points = []
+            for x, y in ring:
+                point = (round(x, SNAP_DECIMALS), round(y, SNAP_DECIMALS))
+                if not points or point != points[-1]:
+                    points.append(point)
+            while len(points) > 1 and points[-1] == points[0]:
+                points.pop()
+            rings[-1].append(points)
+    return rings
+
+#Points where borders meet: points found with different neighbours in different places,
+#like the ends of a border two countries share
+def junctions(rings):
+    neighbours = {}
+    found = set()
+    for ring in rings:
+        for i, point in enumerate(ring):
+            pair = (ring[i - 1], ring[(i + 1) % len(ring)])
+            seen = neighbours.setdefault(point, pair)
+            if seen != pair and seen != pair[::-1]:
+                found.add(point)
+    return found
+
+#Ring cut into arcs from junction to junction. A ring without junctions is one closed arc.
+def ring_arcs(ring, junction_points):
+    starts = [i for i, point in enumerate(ring) if point in junction_points]
+    if not starts:
+        return [ring + ring[:1]]
+    first = starts[0]
+    ring = ring[first:] + ring[:first + 1]
+    ends = [i - first for i in starts] + [len(ring) - 1]
+    return [ring[start:end + 1] for start, end in zip(ends, ends[1:])]
+
+#Arc simplified and quantized, the same way whichever ring and direction it is met in,
+#so countries sharing a border share the arc. Returns the cache entry of the arc (its
+#points and index in the topology arcs, None until a ring keeps it) and whether the
+#ring runs along it backwards.
+def simplified_arc(arc, tolerance, quantize, cache):
+    if arc[0] == arc[-1]:  #Closed arc: same start point and direction for every ring
+        points = arc[:-1]
+        start = points.index(min(points))
+        arc = points[start:] + points[:start + 1]
+    key = min(tuple(arc), tuple(arc[::-1]))
+    if (tolerance, key) not in cache:
+        points = []
+        for point in simplify(list(key), tolerance):
+            point = quantize(point)
+            if not points or point != points[-1]:
+                points.append(point)
+        cache[(tolerance, key)] = [points if len(points) > 1 else points * 2, None]
+    return cache[(tolerance, key)], key != tuple(arc)
+
+#Arc indexes of a ring simplified (~index for an arc run backwards), adding its arcs to
+#the topology arcs. Returns None if the ring collapses to less than a triangle.
+def ring_arc_indexes(ring, junction_points, tolerance, quantize, arcs, cache):
+    parts = [simplified_arc(arc, tolerance, quantize, cache) for arc in ring_arcs(ring, junction_points)]
+    if sum(len(entry[0]) - 1 for entry, backward in parts) < 3:
+        return None
+    indexes = []
+    for entry, backward in parts:
+        if entry[1] is None:
+            entry[1] = len(arcs)
+            arcs.append(entry[0])
+        indexes.append(~entry[1] if backward else entry[1])
+    return indexes
+
+#Topology geometry of a country's rings simplified. Polygons whose outer ring collapses
+#are dropped, but a country always keeps at least its outer rings unsimplified, or a
+#triangle of one grid step where even those are smaller than the grid.
+def topology_geometry(polygons, junction_points, tolerance, quantize, arcs, cache):
+    simplified = []
+    for polygon in polygons:
+        outer = ring_arc_indexes(polygon[0], junction_points, tolerance, quantize, arcs, cache)
+        if outer is None:
+            continue
+        holes = [ring_arc_indexes(ring, junction_points, tolerance, quantize, arcs, cache) for ring in polygon[1:]]
+        simplified.append([outer] + [hole for hole in holes if hole])
+    if not simplified:
+        outers = [ring_arc_indexes(polygon[0], junction_points, 0, quantize, arcs, cache) for polygon in polygons]
+        simplified = [[outer] for outer in outers if outer]
+    if not simplified:
+        x, y = quantize(max((polygon[0] for polygon in polygons), key=len)[0])
+        arcs.append([(x, y), (x + 1, y), (x, y + 1), (x, y)])
+        simplified = [[[len(arcs) - 1]]]
+    if len(simplified) == 1:
+        return {'type': 'Polygon', 'arcs': simplified[0]}
+    return {'type': 'MultiPolygon', 'arcs': simplified}
+
+#Country polygons of a world geojson simplified for a zoom level, as a TopoJSON topology
+#with the countries in objects.countries. Rings are cut into arcs at the points where
+#borders meet and every arc is simplified once and stored once, so neighbouring
+#countries keep one common border, without gaps or overlaps between them, and it is
+#written only once. Arc points are integers on a grid of half the tolerance (transform),
+#each stored as the step from the point before. Only NAME and POP2005
+#properties are kept, with the population fill color as the style folium draws with.
+def prepare_world(data, tolerance):
+    scale = tolerance / 2  #Grid step: points move at most about a quarter of the tolerance
+    countries = [geometry_rings(feature['geometry']) for feature in data['features']]
+    rings = [ring for polygons in countries for polygon in polygons for ring in polygon]
+    junction_points = junctions(rings)
+    x0 = min((x for ring in rings for x, y in ring), default=0.0)
+    y0 = min((y for ring in rings for x, y in ring), default=0.0)
+    quantize = lambda point: (round((point[0] - x0) / scale), round((point[1] - y0) / scale))
+    arcs = []
+    cache = {}
+    geometries = []
+    for feature, polygons in zip(data['features'], countries):
+        properties = feature['properties']
+        geometry = topology_geometry(polygons, junction_points, tolerance, quantize, arcs, cache)
+        geometry['properties'] = {'NAME': properties['NAME'], 'POP2005': properties['POP2005'],
+                                  'style': {'fillColor': pop_color(properties['POP2005'])}}
+        geometries.append(geometry)
+    return {'type': 'Topology',
+            'transform': {'scale': [scale, scale], 'translate': [x0, y0]},
+            'objects': {'countries': {'type': 'GeometryCollection', 'geometries': geometries}},
+            'arcs': [[list(arc[0])] + [[x - px, y - py] for (px, py), (x, y) in zip(arc, arc[1:])] for arc in arcs]}
+
+#Prepared world topology for a zoom level. The result is cached in cache_dir (default: a
+#world_cache folder next to the source) under a name made from a hash of the source file
+#and the settings, so it is only prepared again when world.json or the settings change.
+def prepared_world(path='world.json', zoom=3, pixels=1.0, cache_dir=None):
+    with open(path, 'rb') as f:
+        source = f.read()
+    tolerance = tolerance_for_zoom(zoom, pixels)
+    key = hashlib.sha256(source + json.dumps([CACHE_VERSION, tolerance]).encode()).hexdigest()[:16]
+    cache_dir = cache_dir or os.path.join(os.path.dirname(os.path.abspath(path)), 'world_cache')
+    cache_path = os.path.join(cache_dir, 'world_%s.json' % key)
+    if os.path.exists(cache_path):
+        with open(cache_path, 'r', encoding='utf-8') as f:
+            return json.loads(f.read())
+
+    data = prepare_world(json.loads(source.decode('utf-8-sig')), tolerance)
+    os.makedirs(cache_dir, exist_ok=True)
+    with open(cache_path + '.tmp', 'w', encoding='utf-8') as f:
+        f.write(json.dumps(data, separators=(',', ':'), ensure_ascii=False))
+    os.replace(cache_path + '.tmp', cache_path)  #Other maps built at the same time never read half a file
+    return data
+
+#Feature group of country polygons colored by population, prepared for a zoom level. The
+#default zoom 3 fits a population map read at world scale, see tolerance_for_zoom; pass
+#the zoom the map opens at so the first view draws borders within a pixel.
+def population_layer(path='world.json', zoom=3, name="Population", cache_dir=None):
+    layer = folium.FeatureGroup(name=name)
+    Compact_TopoJson(prepared_world(path, zoom, cache_dir=cache_dir), 'objects.countries').add_to(layer)
+    return layer
+
+#Geojson feature collection of the countries of a prepared topology (as topojson.feature
+#draws them in the browser)
+def topology_features(topology):
+    scale, translate = topology['transform']['scale'], topology['transform']['translate']
+    arcs = []
+    for arc in topology['arcs']:
+        x = y = 0
+        points = []
+        for dx, dy in arc:
+            x, y = x + dx, y + dy
+            points.append([round(x * scale[0] + translate[0], 10), round(y * scale[1] + translate[1], 10)])
+        arcs.append(points)
+
+    def ring(indexes):
+        points = []
+        for index in indexes:
+            arc = arcs[index] if index >= 0 else arcs[~index][::-1]
+            points.extend(arc[1:] if points else arc)
+        return points
+
+    features = []
+    for geometry in topology['objects']['countries']['geometries']:
+        if geometry['type'] == 'Polygon':
+            coordinates = [ring(indexes) for indexes in geometry['arcs']]
+        else:
+            coordinates = [[ring(indexes) for indexes in polygon] for polygon in geometry.get('arcs', [])]
+        features.append({'type': 'Feature', 'properties': geometry['properties'],
+                         'geometry': {'type': geometry['type'] or 'MultiPolygon', 'coordinates': coordinates}})
+    return {'type': 'FeatureCollection', 'features': features}
+
+#Number of coordinate pairs in a geojson feature collection
+def count_points(data):
+    def count(coordinates):
+        return 1 if not isinstance(coordinates[0], list) else sum(count(c) for c in coordinates)
+    return sum(count(feature['geometry']['coordinates']) for feature in data['features'])
+
+#Number of border segments drawn by two rings (borders shared by neighbouring countries)
+def count_shared_segments(data):
+    segments = {}
+    for feature in data['features']:
+        geometry = feature['geometry']
+        for polygon in geometry['coordinates'] if geometry['type'] == 'MultiPolygon' else [geometry['coordinates']]:
+            for ring in polygon:
+                for a, b in zip(ring, ring[1:]):
+                    segment = frozenset([tuple(a), tuple(b)])
+                    segments[segment] = segments.get(segment, 0) + 1
+    return sum(count > 1 for count in segments.values())
+
+#Compare maps with the raw world.json layer (as the notebook used to build it) and the
+#prepared layer: preparation time, cached time, points and html size
+def run_benchmark(path='world.json', zoom=3):
+    results = {'zoom': zoom, 'tolerance_deg': round(tolerance_for_zoom(zoom), 4)}
+    with tempfile.TemporaryDirectory() as folder:
+        start = time.perf_counter()
+        map = folium.Map(location=[38.58, -99.09], zoom_start=5)
+        style_function = lambda x: {'fillColor': pop_color(x['properties']['POP2005'])}
+        with open(path, 'r', encoding='utf-8-sig') as f:
+            map.add_child(folium.GeoJson(data=f.read(), style_function=style_function))
+        map.save(os.path.join(folder, 'raw.html'))
+        results['raw'] = {'build_s': round(time.perf_counter() - start, 3),
+                          'html_kb': round(os.path.getsize(os.path.join(folder, 'raw.html')) / 2 ** 10, 1)}
+        with open(path, 'r', encoding='utf-8-sig') as f:
+            raw = json.loads(f.read())
+        results['raw']['points'] = count_points(raw)
+        results['raw']['shared_segments'] = count_shared_segments(raw)
+
+        for run in ('prepared_first', 'prepared_cached'):
+            start = time.perf_counter()
+            map = folium.Map(location=[38.58, -99.09], zoom_start=5)
+            map.add_child(population_layer(path, zoom, cache_dir=os.path.join(folder, 'cache')))
+            map.save(os.path.join(folder, 'prepared.html'))
+            results[run] = {'build_s': round(time.perf_counter() - start, 3),
+                            'html_kb': round(os.path.getsize(os.path.join(folder, 'prepared.html')) / 2 ** 10, 1)}
+        prepared = prepared_world(path, zoom, cache_dir=os.path.join(folder, 'cache'))
+        results['prepared_cached']['arcs'] = len(prepared['arcs'])
+        results['prepared_cached']['arc_points'] = sum(len(arc) for arc in prepared['arcs'])
+        results['prepared_cached']['points'] = count_points(topology_features(prepared))
+        results['prepared_cached']['shared_segments'] = count_shared_segments(topology_features(prepared))
+    return results
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark the prepared population layer of the web map.")
+    parser.add_argument('world', nargs='?', default='world.json', help="world geojson file")
+    parser.add_argument('--zoom', type=int, default=3, help="zoom level the polygons are simplified for")
+    args = parser.parse_args()
+    print(json.dumps(run_benchmark(args.world, args.zoom), indent=2))
@@ -0,0 +1,285 @@
+import os
+import sys
+import json
+import time
+import heapq
+import random
+import argparse
+import tempfile
+import datetime as dt
+from collections import Counter
+from hosts_blocker import Hosts_File, normalize, make_sites
+
+DAYS = ["mon", "tue", "wed", "thu", "fri", "sat", "sun"]
+
+class Block_Rule():
+    """
+    This class is one blocking rule: a group of sites blocked on a set of weekdays from
+    start to end ("HH:MM", end "24:00" for midnight). A window whose end is not after
+    its start runs past midnight into the next day. Times are minutes of the local
+    wall clock, and dates are moved with timedelta so month and year ends need no
+    special case.
+    """
+    def __init__(self, name, sites, days=DAYS, start="00:00", end="24:00"):
+        self.name = name
+        self.sites = frozenset(normalize(site) for site in sites)
+        self.days = frozenset(parse_day(day) for day in days)
+        self.start = parse_minutes(start)
+        self.length = parse_minutes(end) - self.start
+        if self.length <= 0:
+            self.length += 24 * 60  #Runs past midnight
+        if self.start == 24 * 60 or self.length > 24 * 60 or not self.days:
+            raise ValueError("Rule %r needs a start before 24:00 and at least one day." % name)
+
+    #Start and end of the window starting on a date, None if the rule is off that weekday
+    def window(self, date):
+        if date.weekday() not in self.days:
+            return None
+        start = dt.datetime.combine(date, dt.time()) + dt.timedelta(minutes=self.start)
+        return start, start + dt.timedelta(minutes=self.length)
+
+    #True if the sites are blocked at time t
+    def active(self, t):
+        for days in (-1, 0):  #A window from the day before can still be open
+            window = self.window(t.date() + dt.timedelta(days=days))
+            if window and window[0] <= t < window[1]:
+                return True
+        return False
+
+    #First time after t when the rule turns on or off, None if it never changes (every
+    #day for 24 hours). Windows that meet end to end are one block.
+    def next_change(self, t):
+        state = self.active(t)
+        bounds = []
+        for days in range(-1, 8):
+            window = self.window(t.date() + dt.timedelta(days=days))
+            if window:
+                bounds.extend(bound for bound in window if bound > t)
+        for bound in sorted(bounds):
+            if self.active(bound) != state:
+                return bound
+        return None
+
+class Block_Scheduler():
+    """
+    This class blocks the sites of many rules in a hosts file at the times of the rules.
+    The next transition of every rule is kept in a priority queue (heap), so finding the
+    next wake-up is O(1) and moving a rule to its next transition is O(log n). All the
+    transitions due at the same time are applied in one write of the hosts file, and a
+    site stays blocked while any of its rules is on. The rule file is read again when
+    it changes, checked at least every poll_s seconds. Time comes from a clock object
+    with now() and sleep(seconds), so runs can be simulated with Simulated_Clock.
+    """
+    def __init__(self, hosts, rules_path, clock=None, poll_s=60, verbose=True):
+        self.hosts = hosts
+        self.rules_path = rules_path
+        self.clock = clock or System_Clock()
+        self.poll_s = poll_s
+        self.verbose = verbose
+        self.rules = []
+        self.mtime = None
+        self.heap = []  #(time of next transition, rule index)
+        self.active = set()  #Indexes of the rules on
+        self.counts = Counter()  #Site: number of rules on that block it
+        self.transitions = 0
+        self.reload()
+
+    #Read the rule file again if it changed, and block the sites of the rules on now. A
+    #rule file with errors is reported and the rules in use are kept.
+    def reload(self):
+        try:
+            mtime = os.stat(self.rules_path).st_mtime_ns
+            if mtime == self.mtime:
+                return False
+            self.mtime = mtime
+            rules = load_rules(self.rules_path)
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            print("Rules not loaded from %s: %s" % (self.rules_path, e), file=sys.stderr)
+            return False
+
+        managed = set().union(*(rule.sites for rule in self.rules + rules))
+        now = self.clock.now()
+        self.rules = rules
+        self.active = {idx for idx, rule in enumerate(rules) if rule.active(now)}
+        self.counts = Counter(site for idx in self.active for site in rules[idx].sites)
+        self.hosts.apply(block=self.counts.keys(), unblock=managed - self.counts.keys())
+        self.heap = [(change, idx) for idx, change in enumerate(rule.next_change(now) for rule in rules) if change]
+        heapq.heapify(self.heap)
+        if self.verbose:
+            print("%s: %d rules loaded, %d sites blocked." % (now.strftime("%Y-%m-%d %H:%M"), len(rules), len(self.counts)))
+        return True
+
+    #Apply the transitions due now in one hosts file write. Returns the rules changed.
+    def step(self):
+        now = self.clock.now()
+        due = []
+        while self.heap and self.heap[0][0] <= now:
+            due.append(heapq.heappop(self.heap)[1])
+        changed = []
+        touched = set()
+        for idx in due:
+            rule = self.rules[idx]
+            if rule.active(now) != (idx in self.active):
+                if idx in self.active:
+                    self.active.remove(idx)
+                    self.counts.subtract(rule.sites)
+                else:
+                    self.active.add(idx)
+                    self.counts.update(rule.sites)
+                touched |= rule.sites
+                changed.append(idx)
+            change = rule.next_change(now)
+            if change:
+                heapq.heappush(self.heap, (change, idx))
+        if touched:
+            block = {site for site in touched if self.counts[site] > 0}
+            for site in touched - block:
+                del self.counts[site]
+            self.hosts.apply(block=block, unblock=touched - block)
+        self.transitions += len(changed)
+        if self.verbose and changed:
+            print("%s: %s. %d sites blocked." % (now.strftime("%Y-%m-%d %H:%M"),
+                  ", ".join(self.rules[idx].name + (" on" if idx in self.active else " off") for idx in changed),
+                  len(self.counts)))
+            if self.heap:
+                delta = (self.heap[0][0] - now).total_seconds()
+                print("Transition in ~" + str(int(delta/3600)) + " hours " + str(int(delta%3600/60)) + " minutes.\n")
+        return [self.rules[idx] for idx in changed]
+
+    #Seconds to sleep until the next transition, the next rule file check or until
+    #`until`, whichever comes first
+    def wait(self, until=None):
+        now = self.clock.now()
+        wait = self.poll_s
+        if self.heap:
+            wait = min(wait, (self.heap[0][0] - now).total_seconds())
+        if until is not None:
+            wait = min(wait, (until - now).total_seconds())
+        return max(wait, 0)
+
+    #Apply transitions as they come due until the clock reaches until (forever if None)
+    def run(self, until=None):
+        while until is None or self.clock.now() < until:
+            self.reload()
+            self.step()
+            self.clock.sleep(self.wait(until))
+
+#Wall clock time
+class System_Clock():
+    def now(self):
+        return dt.datetime.now()
+
+    def sleep(self, seconds):
+        time.sleep(seconds)
+
+#Clock that moves only when slept, for running schedules without waiting
+class Simulated_Clock():
+    def __init__(self, start):
+        self.time = start
+
+    def now(self):
+        return self.time
+
+    def sleep(self, seconds):
+        self.time += dt.timedelta(seconds=seconds)
+
+#Weekday number of "mon" to "sun"
+def parse_day(day):
+    try:
+        return DAYS.index(day.strip().lower()[:3])
+    except ValueError:
+        raise ValueError("Unknown day %r." % day) from None
+
+#Minutes after midnight of "HH:MM"
+def parse_minutes(text):
+    hours, _, minutes = text.partition(":")
+    minutes = int(hours) * 60 + int(minutes or 0)
+    if not 0 <= minutes <= 24 * 60:
+        raise ValueError("Time %r is not between 00:00 and 24:00." % text)
+    return minutes
+
+#Rules of a rule file: {"rules": [{"name", "sites", "days", "start", "end"}, ...]}. The
+#sites are a list of names or the path (relative to the rule file) of a file with one
+#site per line.
+def load_rules(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.loads(f.read())
+    rules = []
+    for idx, item in enumerate(data["rules"]):
+        sites = item.get("sites", [])
+        if isinstance(sites, str):
+            with open(os.path.join(os.path.dirname(os.path.abspath(path)), sites), 'r', encoding='utf-8') as f:
+                sites = [line.split('#', 1)[0].strip() for line in f]
+        rules.append(Block_Rule(item.get("name", "Rule %d" % (idx + 1)), [site for site in sites if site],
+                                item.get("days", DAYS), item.get("start", "00:00"), item.get("end", "24:00")))
+    return rules
+
+#Random rules on quarter hours blocking groups of sites from a pool
+def make_rules(n, sites, group_size=100, seed=0):
+    rng = random.Random(seed)
+    rules = []
+    for idx in range(n):
+        start = rng.randrange(96) * 15
+        length = rng.randrange(1, 41) * 15
+        rules.append({"name": "Rule %d" % (idx + 1),
+                      "sites": rng.sample(sites, group_size),
+                      "days": rng.sample(DAYS, rng.randint(1, 7)),
+                      "start": "%02d:%02d" % divmod(start, 60),
+                      "end": "%02d:%02d" % divmod((start + length) % (24 * 60), 60)})
+    return rules
+
+#Run n random rules for a simulated week from the end of a month. The sites blocked in
+#the hosts file are checked against the rules after every check_every-th change, and
+#half way through the rule file is edited (the first rule removed).
+def run_simulation(rules=1000, sites=10000, days=7, check_every=10, seed=0):
+    start = dt.datetime(2021, 1, 31, 0, 0)  #day+1 of the last day of a month is not a date
+    rule_list = make_rules(rules, make_sites(sites, seed), seed=seed)
+    results = {"rules": rules, "sites": sites, "start": start.isoformat(), "days": days}
+    with tempfile.TemporaryDirectory() as folder:
+        hosts_path = os.path.join(folder, "hosts")
+        rules_path = os.path.join(folder, "rules.json")
+        with open(hosts_path, 'w') as f:
+            f.write("127.0.0.1 localhost\n")
+        with open(rules_path, 'w') as f:
+            f.write(json.dumps({"rules": rule_list}))
+        clock = Simulated_Clock(start)
+        hosts = Hosts_File(hosts_path)
+        scheduler = Block_Scheduler(hosts, rules_path, clock, verbose=False)
+
+        wakeups = checks = mismatches = 0
+        step_s = 0.0
+        edited = False
+        end = start + dt.timedelta(days=days)
+        while clock.now() < end:
+            if not edited and clock.now() >= start + dt.timedelta(days=days / 2):
+                with open(rules_path, 'w') as f:
+                    f.write(json.dumps({"rules": rule_list[1:]}))
+                os.utime(rules_path, ns=(time.time_ns(), scheduler.mtime + 1))  #Changed within the same clock tick
+                edited = True
+            scheduler.reload()
+            begin = time.perf_counter()
+            changed = scheduler.step()
+            step_s += time.perf_counter() - begin
+            wakeups += 1
+            if changed and scheduler.transitions % check_every < len(changed):
+                expected = set().union(*(rule.sites for rule in scheduler.rules if rule.active(clock.now())))
+                checks += 1
+                mismatches += (hosts.blocked_sites() - {"localhost"}) != expected
+            clock.sleep(scheduler.wait(end))
+        results.update({"wakeups": wakeups,
+                        "rule_transitions": scheduler.transitions,
+                        "hosts_writes": hosts.writes,
+                        "step_ms": round(step_s * 1000 / wakeups, 3),
+                        "rules_after_edit": len(scheduler.rules),
+                        "state_checks": checks,
+                        "state_mismatches": mismatches})
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Simulate the block scheduler over a week of random rules.")
+    parser.add_argument("-n", "--rules", type=int, default=1000, help="number of rules")
+    parser.add_argument("--sites", type=int, default=10000, help="sites the rules block groups of")
+    parser.add_argument("--days", type=float, default=7, help="simulated days")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    print(json.dumps(run_simulation(args.rules, args.sites, args.days, seed=args.seed), indent=2))
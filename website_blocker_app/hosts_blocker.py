@@ -0,0 +1,200 @@
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+from re import search
+
+class Hosts_File():
+    """
+    This class blocks and unblocks web sites in a hosts file by adding and removing
+    entries that redirect them to the redirect address. The file is parsed once into
+    its lines and an index of the sites redirected and all the lines they are on, so
+    blocking a list of sites is a set difference with the sites already redirected.
+    The file is only written when its content changes, through a temporary file
+    renamed over it, so a crash never leaves a half written hosts file. Changes made
+    to the file by other programs are picked up by reading it again when its size or
+    modification time changes.
+    """
+    def __init__(self, path, redirect="127.0.0.1"):
+        self.path = path
+        self.redirect = redirect
+        self.writes = 0  #Number of times the file was written
+        self.stat = None
+        self.refresh()
+
+    #Read and parse the file again if it changed since it was last read or written
+    def refresh(self):
+        stat = os.stat(self.path)
+        if (stat.st_mtime_ns, stat.st_size) == self.stat:
+            return
+        with open(self.path, 'r', encoding='utf-8', errors='surrogateescape', newline='') as f:
+            content = f.read()
+        self.newline = '\r\n' if '\r\n' in content else '\n'
+        self.lines = content.splitlines(keepends=True)
+        self.index()
+        self.stat = (stat.st_mtime_ns, stat.st_size)
+
+    #Index the sites redirected in the lines
+    def index(self):
+        self.blocked = {}  #Redirected site: indexes of the lines it is on
+        for idx, line in enumerate(self.lines):
+            entry = parse_entry(line)
+            if entry and entry[0] == self.redirect:
+                for site in entry[1]:
+                    self.blocked.setdefault(site, []).append(idx)
+
+    #Block the sites in block and unblock the sites in unblock in one write. Returns
+    #True if the file was written.
+    def apply(self, block=(), unblock=()):
+        self.refresh()
+        block = {normalize(site) for site in block}
+        unblock = {normalize(site) for site in unblock} - block
+        added = block - self.blocked.keys()
+        removed = unblock & self.blocked.keys()
+        if not added and not removed:
+            return False
+
+        if removed:
+            changed = {idx for site in removed for idx in self.blocked[site]}
+            for idx in changed:
+                self.lines[idx] = remove_sites(self.lines[idx], removed)
+            self.lines = [line for line in self.lines if line is not None]
+            self.index()
+        if added:
+            if self.lines and not self.lines[-1].endswith(('\n', '\r')):
+                self.lines[-1] += self.newline
+            for site in sorted(added):
+                self.blocked[site] = [len(self.lines)]
+                self.lines.append(self.redirect + " " + site + self.newline)
+        self.write()
+        return True
+
+    #Redirect the sites
+    def block(self, sites):
+        return self.apply(block=sites)
+
+    #Remove the redirection of the sites
+    def unblock(self, sites):
+        return self.apply(unblock=sites)
+
+    #Sites redirected in the file
+    def blocked_sites(self):
+        self.refresh()
+        return set(self.blocked)
+
+    #Write the lines to a temporary file in the same folder and rename it over the file
+    def write(self):
+        folder = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(dir=folder, prefix='.hosts.', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8', errors='surrogateescape', newline='') as f:
+                f.write(''.join(self.lines))
+                f.flush()
+                os.fsync(f.fileno())
+            try:
+                os.chmod(tmp_path, os.stat(self.path).st_mode & 0o7777)
+            except OSError:
+                pass  #Keep the default mode where it cannot be copied
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        stat = os.stat(self.path)
+        self.stat = (stat.st_mtime_ns, stat.st_size)
+        self.writes += 1
+
+#Site names are not case sensitive
+def normalize(site):
+    return site.strip().lower()
+
+#Address and site names of a hosts file line, None for comments and blank lines
+def parse_entry(line):
+    fields = line.split('#', 1)[0].split()
+    if len(fields) < 2:
+        return None
+    return fields[0], [normalize(site) for site in fields[1:]]
+
+#Line without the sites in removed, None if no site is left on it
+def remove_sites(line, removed):
+    body, hash, comment = line.rstrip('\r\n').partition('#')
+    fields = body.split()
+    sites = [site for site in fields[1:] if normalize(site) not in removed]
+    if not sites:
+        return None
+    ending = line[len(line.rstrip('\r\n')):]
+    return " ".join([fields[0]] + sites) + ((" " + hash + comment) if hash else "") + ending
+
+#Block and unblock sites as the notebook loop did: one regular expression search of
+#the whole file per site, and of every line for every site (for comparison)
+def regex_block(path, sites, redirect="127.0.0.1"):
+    with open(path, 'r+') as f:
+        content = f.read()
+        for link in sites:
+            if search(r'\b' + link + r'\b', content) is None:
+                f.write("\n" + redirect + " " + link)
+
+def regex_unblock(path, sites):
+    with open(path, 'r+') as f:
+        content = f.readlines()
+        f.seek(0)
+        for line in content:
+            if all(search(r'\b' + link + r'\b', line) is None for link in sites):
+                f.write(line)
+        f.truncate()
+
+#Random site names
+def make_sites(n, seed=0):
+    rng = random.Random(seed)
+    letters = "abcdefghijklmnopqrstuvwxyz0123456789"
+    return ["%s%d.%s" % (''.join(rng.choice(letters) for _ in range(8)), i, rng.choice(["com", "net", "org", "io"]))
+            for i in range(n)]
+
+#Time blocking and unblocking n sites in a copy of the hosts file, with the regex loop
+#for up to regex_limit sites
+def run_benchmark(path="hosts", sizes=(100, 1000, 10000, 100000), regex_limit=2000):
+    with open(path, 'r', newline='') as f:
+        original = f.read()
+    results = []
+    with tempfile.TemporaryDirectory() as folder:
+        test_path = os.path.join(folder, "hosts")
+        for n in sizes:
+            sites = make_sites(n)
+            with open(test_path, 'w', newline='') as f:
+                f.write(original)
+            timings = {"sites": n}
+            start = time.perf_counter()
+            hosts = Hosts_File(test_path)
+            timings["parse_s"] = round(time.perf_counter() - start, 4)
+            for step, apply in (("block_s", lambda: hosts.block(sites)),
+                                ("block_again_s", lambda: hosts.block(sites)),
+                                ("parse_blocked_s", lambda: Hosts_File(test_path)),  #File holding all the sites
+                                ("unblock_s", lambda: hosts.unblock(sites)),
+                                ("unblock_again_s", lambda: hosts.unblock(sites))):
+                start = time.perf_counter()
+                apply()
+                timings[step] = round(time.perf_counter() - start, 4)
+            timings["writes"] = hosts.writes
+            with open(test_path, 'r', newline='') as f:
+                timings["restored"] = f.read() == original
+            if n <= regex_limit:
+                start = time.perf_counter()
+                regex_block(test_path, sites)
+                timings["regex_block_s"] = round(time.perf_counter() - start, 4)
+                start = time.perf_counter()
+                regex_unblock(test_path, sites)
+                timings["regex_unblock_s"] = round(time.perf_counter() - start, 4)
+            results.append(timings)
+            print(json.dumps(timings), file=sys.stderr)
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark blocking sites in a hosts file.")
+    parser.add_argument("hosts", nargs="?", default="hosts", help="hosts file to start from (not changed)")
+    parser.add_argument("--sizes", nargs="+", type=int, default=[100, 1000, 10000, 100000], help="numbers of sites")
+    parser.add_argument("--regex-limit", type=int, default=2000, help="largest number of sites run with the regex loop")
+    args = parser.parse_args()
+    print(json.dumps(run_benchmark(args.hosts, args.sizes, args.regex_limit), indent=2))
@@ -0,0 +1,45 @@
+import os
+import tempfile
+import unittest
+from hosts_blocker import Hosts_File
+
+class Hosts_File_Test(unittest.TestCase):
+    """
+    This class checks blocking and unblocking sites in a temporary hosts file.
+    """
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.folder.name, "hosts")
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    # Write content to the hosts file
+    def write(self, content):
+        with open(self.path, 'w', newline='') as f:
+            f.write(content)
+
+    def read(self):
+        with open(self.path, 'r', newline='') as f:
+            return f.read()
+
+    # A site redirected on more than one line is removed from all of them
+    def test_unblock_site_on_many_lines(self):
+        self.write("# hosts\r\n127.0.0.1 facebook.com\r\n127.0.0.1 facebook.com www.x.com # note\r\n")
+        hosts = Hosts_File(self.path)
+        self.assertTrue(hosts.unblock(["facebook.com"]))
+        self.assertEqual(self.read(), "# hosts\r\n127.0.0.1 www.x.com # note\r\n")
+        self.assertEqual(hosts.blocked_sites(), {"www.x.com"})
+        self.assertEqual(Hosts_File(self.path).blocked_sites(), {"www.x.com"})
+
+    # Blocking sites already redirected does not write the file
+    def test_block_again_does_not_write(self):
+        self.write("127.0.0.1 a.com\n")
+        hosts = Hosts_File(self.path)
+        self.assertTrue(hosts.block(["a.com", "B.com"]))
+        self.assertFalse(hosts.block(["b.com"]))
+        self.assertEqual(hosts.writes, 1)
+        self.assertEqual(self.read(), "127.0.0.1 a.com\n127.0.0.1 b.com\n")
+
+if __name__ == '__main__':
+    unittest.main()